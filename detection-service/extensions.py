@@ -10,16 +10,19 @@ New endpoints:
 """
 from __future__ import annotations
 
+import functools
 import io
 import json
 import math
+import threading
 import time
 import wave
 
 import cv2
 import numpy as np
 from fastapi import APIRouter, File, Form, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 
 router = APIRouter()
 
@@ -34,6 +37,16 @@ def _get_confidence():
     return CONFIDENCE
 
 
+def _yolo_input(img: np.ndarray) -> np.ndarray:
+    from main import yolo_input
+    return yolo_input(img)
+
+
+def _yolo_boxes(result):
+    from main import yolo_boxes
+    return yolo_boxes(result)
+
+
 def _decode_image(contents: bytes):
     from main import decode_image
     return decode_image(contents)
@@ -58,12 +71,20 @@ PPE_VEST_HSV_RANGES = [
 PPE_MIN_COVERAGE = 0.12  # 12 % of region must match PPE colour
 
 
+def _best_range_coverage(roi: np.ndarray, ranges) -> float:
+    """Largest fraction of ``roi`` pixels inside any one HSV range."""
+    mask = np.empty(roi.shape[:2], dtype=np.uint8)  # reused by every inRange
+    best = 0
+    for lo, hi in ranges:
+        best = max(best, cv2.countNonZero(cv2.inRange(roi, lo, hi, dst=mask)))
+    return best / mask.size
+
+
 def detect_ppe_in_frame(
     img: np.ndarray, person_boxes: list[dict],
 ) -> list[dict]:
     """Check each detected person for hard hat and safety vest."""
     h, w = img.shape[:2]
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
     results: list[dict] = []
 
     for i, pbox in enumerate(person_boxes):
@@ -82,15 +103,17 @@ def detect_ppe_in_frame(
             "violations": [],
         }
 
-        # --- head region (top 25 %) ---
+        # HSV only for the rows checked below (head + torso), not the whole frame
         head_h = max(1, int(ph * 0.25))
-        head_roi = hsv[py : py + head_h, px : px + pw]
+        torso_off = int(ph * 0.25)
+        torso_h = max(1, int(ph * 0.35))
+        crop = img[py : py + max(head_h, torso_off + torso_h), px : px + pw]
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV) if crop.size else crop
+
+        # --- head region (top 25 %) ---
+        head_roi = hsv[:head_h]
         if head_roi.size > 0:
-            head_px = head_roi.shape[0] * head_roi.shape[1]
-            best = 0.0
-            for lo, hi in PPE_HARDHAT_HSV_RANGES:
-                mask = cv2.inRange(head_roi, lo, hi)
-                best = max(best, float(np.count_nonzero(mask)) / head_px)
+            best = _best_range_coverage(head_roi, PPE_HARDHAT_HSV_RANGES)
             if best >= PPE_MIN_COVERAGE:
                 rec["hardHat"] = True
                 rec["hardHatConfidence"] = round(min(best * 3, 0.95), 3)
@@ -98,15 +121,9 @@ def detect_ppe_in_frame(
                 rec["violations"].append("no_hard_hat")
 
         # --- torso region (25-60 %) ---
-        torso_y = py + int(ph * 0.25)
-        torso_h = max(1, int(ph * 0.35))
-        torso_roi = hsv[torso_y : torso_y + torso_h, px : px + pw]
+        torso_roi = hsv[torso_off : torso_off + torso_h]
         if torso_roi.size > 0:
-            torso_px = torso_roi.shape[0] * torso_roi.shape[1]
-            best = 0.0
-            for lo, hi in PPE_VEST_HSV_RANGES:
-                mask = cv2.inRange(torso_roi, lo, hi)
-                best = max(best, float(np.count_nonzero(mask)) / torso_px)
+            best = _best_range_coverage(torso_roi, PPE_VEST_HSV_RANGES)
             if best >= PPE_MIN_COVERAGE:
                 rec["safetyVest"] = True
                 rec["safetyVestConfidence"] = round(min(best * 3, 0.95), 3)
@@ -127,15 +144,15 @@ async def detect_ppe_endpoint(image: UploadFile = File(...)):
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    h, w = img.shape[:2]
+    small = _yolo_input(img)
+    h, w = small.shape[:2]
     model = _get_model()
-    results = model(img, conf=_get_confidence(), verbose=False)
+    results = model(small, conf=_get_confidence(), classes=[0], verbose=False)
 
     person_boxes: list[dict] = []
     for result in results:
-        for box in result.boxes:
-            if int(box.cls[0]) == 0:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
+        for (x1, y1, x2, y2), _, cls_id in _yolo_boxes(result):
+            if cls_id == 0:
                 person_boxes.append({
                     "x": round(x1 / w, 4),
                     "y": round(y1 / h, 4),
@@ -182,15 +199,16 @@ def analyze_shelf_fullness(
     edges = cv2.Canny(gray, 50, 150)
     edge_density = float(np.count_nonzero(edges)) / max(gray.size, 1)
 
-    # Colour variance (HSV channels)
+    # Colour variance (HSV channels): one pass over the interleaved image
+    # instead of three strided np.std calls with float64 temporaries
     hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
-    h_std = float(np.std(hsv[:, :, 0]))
-    s_std = float(np.std(hsv[:, :, 1]))
-    v_std = float(np.std(hsv[:, :, 2]))
-    colour_var = (h_std + s_std + v_std) / 3.0
+    _, hsv_std = cv2.meanStdDev(hsv)
+    colour_var = float(hsv_std.sum()) / 3.0
 
-    # Texture (Laplacian variance)
-    lap_var = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    # Texture (Laplacian variance). float32 holds the uint8 Laplacian exactly;
+    # meanStdDev accumulates in double without a float64 image or temporaries
+    _, lap_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    lap_var = float(lap_std[0, 0]) ** 2
 
     # Combined score (0-100 %)
     edge_score = min(edge_density / 0.15, 1.0)
@@ -238,7 +256,7 @@ async def detect_shelf_fullness_endpoint(
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
     roi = {"x": roi_x, "y": roi_y, "w": roi_w, "h": roi_h}
-    result = analyze_shelf_fullness(img, roi)
+    result = await run_in_threadpool(analyze_shelf_fullness, img, roi)
     result["inferenceMs"] = round((time.monotonic() - start) * 1000)
     return result
 
@@ -248,6 +266,11 @@ async def detect_shelf_fullness_endpoint(
 # ═══════════════════════════════════════════════════════════════════════
 
 
+# HOG cell of each pixel in the 64x128 crop (4x4 grid of 16x32 cells), scaled
+# by the 8 orientation bins so cell + bin indexes the flat histogram
+_HOG_CELL_IDX = ((np.arange(128)[:, None] // 32) * 4 + np.arange(64)[None, :] // 16) * 8
+
+
 def extract_person_features(img: np.ndarray, bbox: dict) -> np.ndarray:
     """Extract an appearance feature vector from a person crop.
 
@@ -265,49 +288,52 @@ def extract_person_features(img: np.ndarray, bbox: dict) -> np.ndarray:
 
     crop = cv2.resize(crop, (64, 128))
 
-    upper = crop[:64, :]
-    lower = crop[64:, :]
+    # One HSV conversion for the whole crop; the upper/lower halves are row slices
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
 
-    feats: list[float] = []
-    for part in [upper, lower]:
-        hsv_part = cv2.cvtColor(part, cv2.COLOR_BGR2HSV)
+    # Filled in place as float32 — no Python float list round trip
+    feats = np.empty(192, dtype=np.float32)
+    off = 0
+    for hsv_part in (hsv[:64], hsv[64:]):
         h_hist = cv2.calcHist([hsv_part], [0], None, [16], [0, 180])
         s_hist = cv2.calcHist([hsv_part], [1], None, [8], [0, 256])
         v_hist = cv2.calcHist([hsv_part], [2], None, [8], [0, 256])
         cv2.normalize(h_hist, h_hist)
         cv2.normalize(s_hist, s_hist)
         cv2.normalize(v_hist, v_hist)
-        feats.extend(h_hist.flatten().tolist())
-        feats.extend(s_hist.flatten().tolist())
-        feats.extend(v_hist.flatten().tolist())
+        for hist in (h_hist, s_hist, v_hist):
+            n = hist.shape[0]
+            feats[off : off + n] = hist.ravel()
+            off += n
 
     # Simplified HOG (gradient orientation histograms on 4x4 grid)
     gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-    gx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    gy = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    mag = np.sqrt(gx ** 2 + gy ** 2)
-    ang = np.arctan2(gy, gx) * 180.0 / np.pi + 180.0  # 0–360
-
-    cell_h, cell_w = 32, 16
-    for cy in range(0, 128, cell_h):
-        for cx in range(0, 64, cell_w):
-            cm = mag[cy : cy + cell_h, cx : cx + cell_w]
-            ca = ang[cy : cy + cell_h, cx : cx + cell_w]
-            hist, _ = np.histogram(ca, bins=8, range=(0, 360), weights=cm)
-            s = hist.sum()
-            if s > 0:
-                hist = hist / s
-            feats.extend(hist.tolist())
-
-    return np.array(feats, dtype=np.float32)
-
-
-def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
-    na = np.linalg.norm(a)
-    nb = np.linalg.norm(b)
-    if na == 0 or nb == 0:
-        return 0.0
-    return float(np.dot(a, b) / (na * nb))
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    mag = cv2.magnitude(gx, gy)
+    # Exact atan2 in float64 (the integer gradients convert losslessly): axis and
+    # diagonal gradients sit on bin edges, where an approximate angle flips bins
+    ang = np.arctan2(gy, gx, dtype=np.float64) * 180.0 / np.pi + 180.0  # 0–360
+
+    # All 16 cell histograms in one weighted bincount over (cell, bin) indices;
+    # 360° lands in the last bin, as with np.histogram's closed right edge
+    bins = np.minimum((ang * (8 / 360.0)).astype(np.intp), 7)
+    hog = np.bincount(
+        (_HOG_CELL_IDX + bins).ravel(), weights=mag.ravel(), minlength=16 * 8,
+    ).reshape(16, 8)
+    sums = hog.sum(axis=1, keepdims=True)
+    np.divide(hog, sums, out=hog, where=sums > 0)
+    feats[off:] = hog.ravel()
+
+    return feats
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    """float32 matrix of the vectors scaled to unit length (zero rows stay zero)."""
+    m = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    n = np.linalg.norm(m, axis=1, keepdims=True)
+    np.divide(m, n, out=m, where=n > 0)
+    return m
 
 
 @router.post("/extract-features")
@@ -322,15 +348,15 @@ async def extract_features_endpoint(
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    h, w = img.shape[:2]
+    small = _yolo_input(img)
+    h, w = small.shape[:2]
     model = _get_model()
-    results = model(img, conf=_get_confidence(), verbose=False)
+    results = model(small, conf=_get_confidence(), classes=[0], verbose=False)
 
     persons: list[dict] = []
     for result in results:
-        for box in result.boxes:
-            if int(box.cls[0]) == 0:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
+        for (x1, y1, x2, y2), _, cls_id in _yolo_boxes(result):
+            if cls_id == 0:
                 bbox = {
                     "x": round(x1 / w, 4),
                     "y": round(y1 / h, 4),
@@ -368,26 +394,20 @@ async def match_persons_endpoint(
         return JSONResponse(status_code=400, content={"error": "Invalid JSON"})
 
     matches: list[dict] = []
-    used_b: set[int] = set()
-    for i, fa in enumerate(feats_a):
-        va = np.array(fa, dtype=np.float32)
-        best_j = -1
-        best_sim = threshold
-        for j, fb in enumerate(feats_b):
-            if j in used_b:
-                continue
-            vb = np.array(fb, dtype=np.float32)
-            sim = cosine_similarity(va, vb)
-            if sim > best_sim:
-                best_sim = sim
-                best_j = j
-        if best_j >= 0:
-            used_b.add(best_j)
-            matches.append({
-                "personA": i,
-                "personB": best_j,
-                "similarity": round(best_sim, 4),
-            })
+    if feats_a and feats_b:
+        # All pairwise cosine similarities in one product of unit-row matrices
+        sims = _unit_rows(feats_a) @ _unit_rows(feats_b).T
+        # Greedy in A order; a matched B column is masked out for later rows
+        for i, row in enumerate(sims):
+            best_j = int(np.argmax(row))
+            best_sim = float(row[best_j])
+            if best_sim > threshold:
+                sims[:, best_j] = -np.inf
+                matches.append({
+                    "personA": i,
+                    "personB": best_j,
+                    "similarity": round(best_sim, 4),
+                })
 
     return {
         "matches": matches,
@@ -404,6 +424,7 @@ async def match_persons_endpoint(
 # ═══════════════════════════════════════════════════════════════════════
 
 _dewarp_cache: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+_dewarp_cache_lock = threading.Lock()  # dewarp runs in the threadpool
 
 
 def dewarp_fisheye(
@@ -416,32 +437,44 @@ def dewarp_fisheye(
     h, w = img.shape[:2]
     cache_key = (h, w, fov, cx_ratio, cy_ratio)
 
-    if cache_key in _dewarp_cache:
-        map_x, map_y = _dewarp_cache[cache_key]
+    # Single get(): a concurrent eviction between a membership test and an
+    # index would raise KeyError; writers and evictions hold the lock
+    cached = _dewarp_cache.get(cache_key)
+    if cached is not None:
+        map1, map2 = cached
     else:
         cx = w * cx_ratio
         cy = h * cy_ratio
         fov_rad = fov * np.pi / 180.0
-        f = min(w, h) / (2.0 * np.tan(fov_rad / 2.0 + 1e-6))
-
-        xs, ys = np.meshgrid(np.arange(w, dtype=np.float32),
-                             np.arange(h, dtype=np.float32))
-        nx = (xs - cx) / f
-        ny = (ys - cy) / f
-        r = np.sqrt(nx ** 2 + ny ** 2)
-        r = np.maximum(r, 1e-8)
-        theta = np.arctan(r)
-        rc = f * theta
-
-        map_x = (cx + rc * nx / r).astype(np.float32)
-        map_y = (cy + rc * ny / r).astype(np.float32)
+        f = min(w, h) / (2.0 * math.tan(fov_rad / 2.0 + 1e-6))  # Python float keeps the maps float32
+
+        # Broadcast a row of x and a column of y offsets instead of full
+        # meshgrids; the radial scale f·atan(r)/r is built in place in one buffer
+        nx = ((np.arange(w, dtype=np.float32) - cx) / f)[None, :]
+        ny = ((np.arange(h, dtype=np.float32) - cy) / f)[:, None]
+        r = np.hypot(nx, ny)
+        np.maximum(r, 1e-8, out=r)
+        scale = np.arctan(r)
+        scale *= f
+        scale /= r
+        del r
+
+        map_x = scale * nx
+        map_x += cx
+        scale *= ny
+        scale += cy
+        map_y = scale
+        # Fixed-point maps (int16 xy + interpolation index): 4+2 bytes per pixel
+        # instead of 4+4, and remap's native format, so no per-call conversion
+        map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
 
         # Keep small cache (max 8 entries)
-        if len(_dewarp_cache) >= 8:
-            _dewarp_cache.pop(next(iter(_dewarp_cache)))
-        _dewarp_cache[cache_key] = (map_x, map_y)
+        with _dewarp_cache_lock:
+            if len(_dewarp_cache) >= 8:
+                _dewarp_cache.pop(next(iter(_dewarp_cache)))
+            _dewarp_cache[cache_key] = (map1, map2)
 
-    return cv2.remap(img, map_x, map_y, cv2.INTER_LINEAR,
+    return cv2.remap(img, map1, map2, cv2.INTER_LINEAR,
                      borderMode=cv2.BORDER_CONSTANT)
 
 
@@ -459,11 +492,15 @@ async def dewarp_endpoint(
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    dewarped = dewarp_fisheye(img, fov, cx, cy)
-    _, jpeg = cv2.imencode(".jpg", dewarped, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    def _dewarp_jpeg() -> bytes:
+        dewarped = dewarp_fisheye(img, fov, cx, cy)
+        return cv2.imencode(".jpg", dewarped, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
 
-    return StreamingResponse(
-        io.BytesIO(jpeg.tobytes()),
+    jpeg = await run_in_threadpool(_dewarp_jpeg)
+
+    # A finished JPEG goes out in one body; no BytesIO wrapper or chunked iteration
+    return Response(
+        content=jpeg,
         media_type="image/jpeg",
         headers={
             "X-Inference-Ms": str(round((time.monotonic() - start) * 1000)),
@@ -476,11 +513,20 @@ async def dewarp_endpoint(
 # ═══════════════════════════════════════════════════════════════════════
 
 
+@functools.lru_cache(maxsize=32)
+def _rfft_freqs(n: int, sample_rate: int) -> np.ndarray:
+    """Frequency axis for an n-sample rfft; clips share a few lengths/rates."""
+    freqs = np.fft.rfftfreq(n, d=1.0 / sample_rate)
+    freqs.flags.writeable = False  # shared between requests
+    return freqs
+
+
 def _band_energy(
-    magnitudes: np.ndarray, freqs: np.ndarray, f_lo: float, f_hi: float,
+    power: np.ndarray, freqs: np.ndarray, f_lo: float, f_hi: float,
 ) -> float:
-    mask = (freqs >= f_lo) & (freqs < f_hi)
-    return float(np.sum(magnitudes[mask] ** 2))
+    # freqs is ascending, so [f_lo, f_hi) is one contiguous slice
+    lo, hi = np.searchsorted(freqs, (f_lo, f_hi))
+    return float(power[lo:hi].sum())
 
 
 def analyze_audio_data(audio_bytes: bytes, sample_rate: int = 16000) -> dict:
@@ -517,12 +563,13 @@ def analyze_audio_data(audio_bytes: bytes, sample_rate: int = 16000) -> dict:
 
     # --- FFT ---
     fft = np.fft.rfft(samples)
-    freqs = np.fft.rfftfreq(len(samples), d=1.0 / sample_rate)
+    freqs = _rfft_freqs(len(samples), sample_rate)
     mags = np.abs(fft) / max(len(samples), 1)
+    power = mags * mags
 
-    low_e = _band_energy(mags, freqs, 20, 300)
-    mid_e = _band_energy(mags, freqs, 300, 2000)
-    high_e = _band_energy(mags, freqs, 2000, 8000)
+    low_e = _band_energy(power, freqs, 20, 300)
+    mid_e = _band_energy(power, freqs, 300, 2000)
+    high_e = _band_energy(power, freqs, 2000, 8000)
     total_e = low_e + mid_e + high_e + 1e-10
 
     spectral_centroid = 0.0
@@ -567,7 +614,8 @@ def analyze_audio_data(audio_bytes: bytes, sample_rate: int = 16000) -> dict:
         dom_freq = float(freqs[dom_idx])
         dom_mag = float(mags[dom_idx])
         if 500 < dom_freq < 4000:
-            harm_idx = int(np.argmin(np.abs(freqs - dom_freq * 2)))
+            # Uniform bins: the bin nearest 2·f is 2·k (clamped to Nyquist)
+            harm_idx = min(2 * dom_idx, len(freqs) - 1)
             harm_mag = float(mags[harm_idx])
             if harm_mag > dom_mag * 0.3:
                 mean_mag = float(mags.mean()) + 1e-10
@@ -612,7 +660,7 @@ async def analyze_audio_endpoint(
     if len(contents) == 0:
         return JSONResponse(status_code=400, content={"error": "Empty audio"})
 
-    result = analyze_audio_data(contents, sample_rate)
+    result = await run_in_threadpool(analyze_audio_data, contents, sample_rate)
     result["inferenceMs"] = round((time.monotonic() - start) * 1000)
     result["durationMs"] = round(len(contents) / max(sample_rate * 2, 1) * 1000)
     return result
@@ -3,20 +3,29 @@ from __future__ import annotations
 import io
 import os
 import time
-import math
 import asyncio
+import bisect
 import threading
 import functools
 from collections import defaultdict
-from typing import Optional
+from typing import Iterator, Optional
+
+# Bound the BLAS/OpenMP pools before numpy/cv2/torch load them: every stream
+# worker runs its own inference, so per-call pools sized to all cores oversubscribe.
+CPU_THREADS = os.getenv("CPU_THREADS", "2")
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, CPU_THREADS)
 
 from fastapi import FastAPI, File, UploadFile, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
 import cv2
 import httpx
 
+cv2.setNumThreads(int(CPU_THREADS))
+
 app = FastAPI(title="CamAI YOLO Detection Service")
 
 app.add_middleware(
@@ -30,6 +39,9 @@ app.add_middleware(
 _model = None
 _model_lock = threading.Lock()
 CONFIDENCE = float(os.getenv("YOLO_CONFIDENCE", "0.40"))
+# Weights or an exported model dir, e.g. an OpenVINO INT8 export from
+# `yolo export model=yolov8n.pt format=openvino int8=True` → "yolov8n_int8_openvino_model/"
+YOLO_MODEL = os.getenv("YOLO_MODEL", "yolov8n.pt")
 
 # YOLO COCO class mapping to our detection types
 CLASS_TYPE_MAP: dict[int, tuple[str, str, str]] = {
@@ -58,6 +70,12 @@ FILTER_CATEGORIES: dict[str, set[int]] = {
     "fire": {-3},  # sentinel: HSV-based fire/smoke detection (not a YOLO class)
 }
 
+# All class IDs covered by a named category (anything else is "other")
+NAMED_CLASS_IDS: frozenset[int] = frozenset().union(*FILTER_CATEGORIES.values())
+
+# Classes classify_detection reports; passed to YOLO as `classes=` so NMS skips the rest
+DETECTABLE_CLASS_IDS: list[int] = sorted(CLASS_TYPE_MAP)
+
 
 def parse_class_filter(classes_param: str | None) -> set[int] | None:
     """Parse 'classes' query param into a set of allowed YOLO class IDs.
@@ -90,7 +108,7 @@ def get_model():
         with _model_lock:
             if _model is None:  # double-check after acquiring lock
                 from ultralytics import YOLO
-                _model = YOLO("yolov8n.pt")
+                _model = YOLO(YOLO_MODEL, task="detect")
     return _model
 
 
@@ -103,6 +121,34 @@ def classify_detection(class_id: int, class_name: str):
     return None
 
 
+YOLO_IMGSZ = 640  # ultralytics' default inference size
+
+
+def yolo_input(img: np.ndarray) -> np.ndarray:
+    """Shrink a frame to the model input size before inference.
+
+    Ultralytics letterboxes with a bilinear resize of the full frame; an
+    INTER_AREA shrink to the same size here makes that resize a no-op and
+    gives a cleaner downscale. Boxes come back in the returned image's
+    coordinates, so normalise them by its shape.
+    """
+    h, w = img.shape[:2]
+    scale = YOLO_IMGSZ / max(h, w)
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def yolo_boxes(result) -> Iterator[tuple[list[float], float, int]]:
+    """Iterate a YOLO result as ``([x1, y1, x2, y2], conf, cls_id)`` tuples.
+
+    Copies the box tensors out in three bulk ``tolist()`` calls instead of
+    indexing a Boxes object (and a tensor per field) for every detection.
+    """
+    boxes = result.boxes
+    return zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.int().tolist())
+
+
 def decode_image(contents: bytes):
     """Decode image bytes to OpenCV format."""
     nparr = np.frombuffer(contents, np.uint8)
@@ -168,16 +214,18 @@ def detect_fire_smoke(img: np.ndarray) -> dict:
             })
             fire_area_total += area
 
+    # Grayscale is shared by the fire and smoke checks; converted at most once
+    gray = None
+
     # Check for flickering (fire characteristic) via brightness variance in fire regions
     fire_confidence = 0.0
     if fire_regions:
         # Higher confidence if fire area is large and regions have high brightness
         fire_pct = fire_area_total / total_pixels
         # Check brightness in fire regions (fire is bright)
-        fire_mask_bool = mask_fire > 0
-        if fire_mask_bool.any():
+        if cv2.countNonZero(mask_fire) > 0:
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            mean_brightness = float(np.mean(gray[fire_mask_bool]))
+            mean_brightness = cv2.mean(gray, mask=mask_fire)[0]
             # Fire should be bright (>150)
             brightness_factor = min(mean_brightness / 200.0, 1.0)
             fire_confidence = min(fire_pct * 20 * brightness_factor, 0.99)
@@ -207,11 +255,10 @@ def detect_fire_smoke(img: np.ndarray) -> dict:
     if smoke_regions:
         smoke_pct = smoke_area_total / total_pixels
         # Check texture variance: real smoke has uneven brightness, gray surfaces are uniform
-        smoke_mask_bool = mask_smoke > 0
-        if smoke_mask_bool.any():
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            smoke_pixels = gray[smoke_mask_bool]
-            brightness_std = float(np.std(smoke_pixels))
+        if cv2.countNonZero(mask_smoke) > 0:
+            if gray is None:
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            brightness_std = float(cv2.meanStdDev(gray, mask=mask_smoke)[1][0, 0])
             # Uniform surfaces (asphalt, concrete, buildings) have low std (<25), smoke has higher (>30)
             if brightness_std < 25:
                 smoke_regions = []  # reject — too uniform, likely not smoke
@@ -442,10 +489,11 @@ def analyze_behavior(
             cx2 = p2["x"] + p2["w"] / 2
             cy2 = p2["y"] + p2["h"] / 2
 
-            dist = math.sqrt((cx1 - cx2) ** 2 + (cy1 - cy2) ** 2)
+            dx = cx1 - cx2
+            dy = cy1 - cy2
 
-            # Close proximity (< 15% of frame diagonal)
-            if dist < 0.15:
+            # Close proximity (< 15% of frame diagonal); squared, so no sqrt per pair
+            if dx * dx + dy * dy < 0.15 * 0.15:
                 # Check motion in overlap region
                 ox = int(min(cx1, cx2) * w)
                 oy = int(min(cy1, cy2) * h)
@@ -483,7 +531,8 @@ def analyze_behavior(
 
 # ─── Speed Estimation ──────────────────────────────────────────────
 
-_prev_centroids: dict[str, dict[int, tuple[float, float, float]]] = {}  # cam_id -> {track_idx -> (cx, cy, timestamp)}
+# cam_id -> ((N, 2) normalized centroids of the last call, timestamp of that call)
+_prev_centroids: dict[str, tuple[np.ndarray, float]] = {}
 
 
 def estimate_speeds(
@@ -493,68 +542,63 @@ def estimate_speeds(
     fps: float = 4.0,
 ) -> list[dict]:
     """Estimate speed of tracked persons using centroid displacement."""
-    global _prev_centroids
-
     now = time.monotonic()
 
     # TTL cleanup — purge stale camera entries
-    stale = [k for k, v in _prev_centroids.items()
-             if v and all(now - ts > _PREV_TTL for _, _, ts in v.values())]
+    stale = [k for k, (_, ts) in _prev_centroids.items() if now - ts > _PREV_TTL]
     for k in stale:
         del _prev_centroids[k]
 
-    if camera_id not in _prev_centroids:
-        _prev_centroids[camera_id] = {}
+    current = np.array(
+        [(b["x"] + b["w"] / 2, b["y"] + b["h"] / 2) for b in person_boxes], dtype=np.float64,
+    ).reshape(-1, 2)
+    prev_entry = _prev_centroids.get(camera_id)
+    _prev_centroids[camera_id] = (current, now)
 
-    prev = _prev_centroids[camera_id]
-    speeds = []
+    if prev_entry is None or len(prev_entry[0]) == 0 or len(current) == 0:
+        return []
+    prev, prev_ts = prev_entry
 
-    current_centroids: dict[int, tuple[float, float, float]] = {}
+    time_diff = now - prev_ts
+    if time_diff <= 0.05:  # at least 50ms
+        return []
 
-    for i, pbox in enumerate(person_boxes):
-        cx = pbox["x"] + pbox["w"] / 2
-        cy = pbox["y"] + pbox["h"] / 2
-
-        # Match to closest previous centroid
-        best_match = -1
-        best_dist = 0.15  # max matching distance (15% of frame)
-
-        for pidx, (pcx, pcy, pt) in prev.items():
-            d = math.sqrt((cx - pcx) ** 2 + (cy - pcy) ** 2)
-            if d < best_dist:
-                best_dist = d
-                best_match = pidx
-
-        if best_match >= 0:
-            pcx, pcy, pt = prev[best_match]
-            time_diff = now - pt
-
-            if time_diff > 0.05:  # at least 50ms
-                # Displacement in normalized coords
-                pixel_dist = math.sqrt((cx - pcx) ** 2 + (cy - pcy) ** 2)
-                # Convert to real-world distance (approximate)
-                meters = pixel_dist * pixels_per_meter
-                speed_mps = meters / time_diff
-                speed_kmh = speed_mps * 3.6
-
-                if speed_kmh > 1.0:  # filter noise
-                    speeds.append({
-                        "personIndex": i,
-                        "speedMps": round(speed_mps, 2),
-                        "speedKmh": round(speed_kmh, 1),
-                        "bbox": pbox,
-                    })
+    # Match each person to the closest previous centroid (all pairs at once)
+    dists = np.sqrt(((current[:, None, :] - prev[None, :, :]) ** 2).sum(axis=2))
+    best_dists = dists.min(axis=1)
 
-            current_centroids[i] = (cx, cy, now)
-        else:
-            current_centroids[i] = (cx, cy, now)
+    speeds = []
+    for i in np.flatnonzero(best_dists < 0.15):  # max matching distance (15% of frame)
+        # best_dist is the displacement in normalized coords;
+        # convert to real-world distance (approximate)
+        meters = float(best_dists[i]) * pixels_per_meter
+        speed_mps = meters / time_diff
+        speed_kmh = speed_mps * 3.6
+
+        if speed_kmh > 1.0:  # filter noise
+            speeds.append({
+                "personIndex": int(i),
+                "speedMps": round(speed_mps, 2),
+                "speedKmh": round(speed_kmh, 1),
+                "bbox": person_boxes[i],
+            })
 
-    _prev_centroids[camera_id] = current_centroids
     return speeds
 
 
 # ─── Crowd Density Estimation ──────────────────────────────────────
 
+# Density thresholds (persons/m²) and the level for each band
+_DENSITY_THRESHOLDS = (0.3, 0.8, 1.5, 3.0)
+_DENSITY_LEVELS = (
+    ("empty", "Пусто"),
+    ("sparse", "Свободно"),
+    ("moderate", "Умеренно"),
+    ("crowded", "Многолюдно"),
+    ("very_crowded", "Очень многолюдно"),
+)
+
+
 def estimate_crowd_density(
     person_count: int,
     fov_area_m2: float = 50.0,
@@ -562,21 +606,7 @@ def estimate_crowd_density(
     """Estimate crowd density from person count and camera field-of-view area."""
     density = person_count / fov_area_m2 if fov_area_m2 > 0 else 0
 
-    if density < 0.3:
-        level = "empty"
-        label = "Пусто"
-    elif density < 0.8:
-        level = "sparse"
-        label = "Свободно"
-    elif density < 1.5:
-        level = "moderate"
-        label = "Умеренно"
-    elif density < 3.0:
-        level = "crowded"
-        label = "Многолюдно"
-    else:
-        level = "very_crowded"
-        label = "Очень многолюдно"
+    level, label = _DENSITY_LEVELS[bisect.bisect_right(_DENSITY_THRESHOLDS, density)]
 
     return {
         "personCount": person_count,
@@ -598,16 +628,14 @@ async def detect(image: UploadFile = File(...)):
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    h, w = img.shape[:2]
+    small = yolo_input(img)
+    h, w = small.shape[:2]
     model = get_model()
-    results = model(img, conf=CONFIDENCE, verbose=False)
+    results = model(small, conf=CONFIDENCE, classes=DETECTABLE_CLASS_IDS, verbose=False)
 
     detections = []
     for result in results:
-        for box in result.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            conf = float(box.conf[0])
-            cls_id = int(box.cls[0])
+        for (x1, y1, x2, y2), conf, cls_id in yolo_boxes(result):
             cls_name = model.names.get(cls_id, "unknown")
 
             classified = classify_detection(cls_id, cls_name)
@@ -647,7 +675,7 @@ async def detect_fire_endpoint(image: UploadFile = File(...)):
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    result = detect_fire_smoke(img)
+    result = await run_in_threadpool(detect_fire_smoke, img)
     result["inferenceMs"] = round((time.monotonic() - start) * 1000)
     return result
 
@@ -662,17 +690,16 @@ async def detect_plates_endpoint(image: UploadFile = File(...)):
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    h, w = img.shape[:2]
+    small = yolo_input(img)
+    h, w = small.shape[:2]
     model = get_model()
-    results = model(img, conf=0.5, verbose=False)
+    results = model(small, conf=0.5, classes=sorted(VEHICLE_CLASSES), verbose=False)
 
     # Get vehicle bounding boxes
     vehicle_boxes = []
     for result in results:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
+        for (x1, y1, x2, y2), _, cls_id in yolo_boxes(result):
             if cls_id in VEHICLE_CLASSES:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
                 vehicle_boxes.append({
                     "x": x1 / w,
                     "y": y1 / h,
@@ -704,17 +731,16 @@ async def analyze_behavior_endpoint(
     if img is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image"})
 
-    h, w = img.shape[:2]
+    small = yolo_input(img)
+    h, w = small.shape[:2]
     model = get_model()
-    results = model(img, conf=CONFIDENCE, verbose=False)
+    results = model(small, conf=CONFIDENCE, classes=[0], verbose=False)
 
     # Extract person bounding boxes
     person_boxes = []
     for result in results:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
+        for (x1, y1, x2, y2), _, cls_id in yolo_boxes(result):
             if cls_id == 0:  # person
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
                 person_boxes.append({
                     "x": round(x1 / w, 4),
                     "y": round(y1 / h, 4),
@@ -801,8 +827,28 @@ def _render_label(text: str, color_rgb: tuple[int, int, int]) -> np.ndarray:
     return cv2.cvtColor(np.array(label_img), cv2.COLOR_RGB2BGR)
 
 
-def draw_detections(img: np.ndarray, detections: list[dict]) -> np.ndarray:
-    """Draw bounding boxes, labels, and count badge. Boxes via OpenCV, Cyrillic via cached Pillow labels."""
+def count_detection_types(detections: list[dict]) -> tuple[int, int]:
+    """Single pass over detections → (person_count, fire_count)."""
+    person_count = 0
+    fire_count = 0
+    for d in detections:
+        t = d.get("type")
+        if t == "person":
+            person_count += 1
+        elif t == "fire" or t == "smoke":
+            fire_count += 1
+    return person_count, fire_count
+
+
+def draw_detections(
+    img: np.ndarray,
+    detections: list[dict],
+    counts: tuple[int, int] | None = None,
+) -> np.ndarray:
+    """Draw bounding boxes, labels, and count badge. Boxes via OpenCV, Cyrillic via cached Pillow labels.
+
+    ``counts`` is an optional precomputed (person_count, fire_count) pair.
+    """
     h, w = img.shape[:2]
     if h == 0 or w == 0:
         return img
@@ -849,8 +895,7 @@ def draw_detections(img: np.ndarray, detections: list[dict]) -> np.ndarray:
 
     # Count badge (top-right corner)
     if detections:
-        person_count = sum(1 for d in detections if d.get("type") == "person")
-        fire_count = sum(1 for d in detections if d.get("type") in ("fire", "smoke"))
+        person_count, fire_count = counts or count_detection_types(detections)
         other_count = len(detections) - person_count - fire_count
         parts = []
         if person_count > 0:
@@ -874,30 +919,92 @@ def draw_detections(img: np.ndarray, detections: list[dict]) -> np.ndarray:
     return img
 
 
-# ─── MJPEG Stream: dual-thread pipeline for 30fps output ─────────
+# ─── MJPEG Stream: threaded capture → YOLO pipeline for 30fps output ─
 
 TARGET_FPS = 30
 FRAME_INTERVAL = 1.0 / TARGET_FPS  # ~33ms
 MAX_INPUT_FPS = 20  # Cap input frame rate to save CPU
 MIN_FRAME_INTERVAL = 1.0 / MAX_INPUT_FPS
 MAX_PROCESS_WIDTH = 1280  # Resize frames wider than this before processing
+CAPTURE_STALL_TIMEOUT = 4.0  # No VideoCapture frame for this long → HTTP polling
+FRAME_WAIT_TIMEOUT = 0.5  # Worker wake-up for stall/stop checks while no frame arrives
+MOTION_GATE_SIZE = (160, 120)  # Thumbnail compared between frames to skip YOLO
+MOTION_THRESHOLD = 2.5  # Mean abs gray diff below this counts as a static scene
+MOTION_HEARTBEAT = 1.0  # Re-run YOLO at least this often even when static
+# Run YOLO on at most every Nth frame; boxes are reused in between
+DETECT_EVERY_N = max(1, int(os.getenv("DETECT_EVERY_N", "1")))
+# Opt-in OpenCL (T-API) for the per-frame resize/gray pipeline, e.g. on iGPU boxes
+USE_OPENCL = os.getenv("USE_OPENCL", "0") == "1" and cv2.ocl.haveOpenCL()
+cv2.ocl.setUseOpenCL(USE_OPENCL)
+
+# Shared by all snapshot-polling streams so connections to each camera are kept alive
+_snapshot_client = httpx.Client(timeout=2.0, limits=httpx.Limits(max_keepalive_connections=16))
+FIRE_CHECK_INTERVAL = 0.25  # HSV fire/smoke scan rate; results reused in between
+
+
+def _prepare_frame(
+    img: np.ndarray, resize_buf: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Downscale a frame to MAX_PROCESS_WIDTH and build its motion-gate thumbnail.
+
+    ``resize_buf`` is the previous frame's downscaled image; when the size still
+    matches it is overwritten instead of allocating a new multi-MB array.
+    With USE_OPENCL the frame is uploaded once as a UMat and both resizes and the
+    gray conversion run on the device; only the results are read back.
+    """
+    h, w = img.shape[:2]
+    src = cv2.UMat(img) if USE_OPENCL else img
+    resized = w > MAX_PROCESS_WIDTH
+    if resized:
+        size = (MAX_PROCESS_WIDTH, int(h * MAX_PROCESS_WIDTH / w))
+        if USE_OPENCL or resize_buf is None or resize_buf.shape[:2] != (size[1], size[0]):
+            resize_buf = None
+        src = cv2.resize(src, size, dst=resize_buf)
+    gate = cv2.cvtColor(
+        cv2.resize(src, MOTION_GATE_SIZE, interpolation=cv2.INTER_AREA),
+        cv2.COLOR_BGR2GRAY,
+    )
+    if USE_OPENCL:
+        # YOLO, drawing and imencode need CPU memory
+        return (src.get() if resized else img), gate.get()
+    return src, gate
 
 
 class MjpegStream:
-    """Dual-thread MJPEG stream: YOLO runs in background, output at 30fps."""
+    """Threaded MJPEG stream: capture and YOLO run in background threads, output at 30fps."""
+
+    __slots__ = (
+        "camera_url", "allowed_classes", "skip_yolo", "has_other", "run_fire", "yolo_classes",
+        "stop_event", "latest_part", "yolo_fps", "counts", "_worker",
+        "_frame_ready", "_frame", "_capture_gen",
+    )
 
     def __init__(self, camera_url: str, allowed_classes: set[int] | None = None):
         self.camera_url = camera_url
         self.allowed_classes = allowed_classes
         self.skip_yolo = allowed_classes == {-2}  # "none" mode: raw video
+        self.has_other = allowed_classes is not None and -1 in allowed_classes
+        self.run_fire = allowed_classes is None or -3 in allowed_classes
+        # Reportable YOLO classes passing the filter; empty (e.g. fire only) skips YOLO
+        self.yolo_classes = [
+            c for c in DETECTABLE_CLASS_IDS
+            if allowed_classes is None
+            or c in allowed_classes
+            or (self.has_other and c not in NAMED_CLASS_IDS)
+        ]
         self.stop_event = threading.Event()
-        self.lock = threading.Lock()
-        self.latest_jpeg: bytes | None = None
+        # (seq, multipart chunk) — seq bumps per encoded frame; replaced as a whole
+        self.latest_part: tuple[int, bytes | None] = (0, None)
         self.yolo_fps: float = 0.0
-        self.person_count: int = 0
-        self.total_count: int = 0
-        self.fire_count: int = 0
+        # (person, total, fire) — replaced as a whole so readers need no lock
+        self.counts: tuple[int, int, int] = (0, 0, 0)
         self._worker: threading.Thread | None = None
+        # Latest-frame slot filled by the capture thread: (seq, frame), replaced as a
+        # whole so no lock is needed; _frame_ready wakes the worker on each new frame.
+        # bytes frames are the camera's untouched JPEG (raw mode).
+        self._frame: tuple[int, np.ndarray | bytes | None] = (0, None)
+        self._frame_ready = threading.Event()
+        self._capture_gen = 0  # bumping it retires the running capture thread
 
     def start(self):
         self._worker = threading.Thread(target=self._yolo_loop, daemon=True)
@@ -905,6 +1012,7 @@ class MjpegStream:
 
     def stop(self):
         self.stop_event.set()
+        self._frame_ready.set()  # wake the worker so it sees stop_event
         if self._worker:
             self._worker.join(timeout=3)
 
@@ -923,7 +1031,6 @@ class MjpegStream:
 
         # Try cv2.VideoCapture with MJPEG stream (faster than HTTP polling)
         cap = None
-        use_http = False
         base = self.camera_url.rstrip("/")
 
         # Skip VideoCapture probing in raw mode (no YOLO) — just use HTTP
@@ -932,6 +1039,8 @@ class MjpegStream:
                 c = None
                 try:
                     c = cv2.VideoCapture(url)
+                    # Hold one frame at most so reads return the live frame, not a backlog
+                    c.set(cv2.CAP_PROP_BUFFERSIZE, 1)
                     if c.isOpened():
                         ret, _ = c.read()
                         if ret:
@@ -954,115 +1063,82 @@ class MjpegStream:
                     cap = result["cap"]
                     break
 
-        if cap is None:
-            use_http = True
         stream_url = base + "/shot.jpg"
+        self._start_capture(cap, stream_url)
 
-        http_client = httpx.Client() if use_http else None
         fps_counter = 0
         fps_timer = time.monotonic()
-        print(f"[MjpegStream] Entering loop: use_http={use_http}, cap={cap is not None}, stream_url={stream_url}", flush=True)
-
-        cap_read_fails = 0
+        print(f"[MjpegStream] Entering loop: use_http={cap is None}, cap={cap is not None}, stream_url={stream_url}", flush=True)
+
+        use_cap = cap is not None
+        last_seq = 0
+        last_frame_at = time.monotonic()
+        first_frame = True
+        fire_result: dict | None = None
+        fire_checked_at = 0.0
+        prev_gate: np.ndarray | None = None
+        yolo_detections: list[dict] = []
+        yolo_at = 0.0
+        frames_since_yolo = DETECT_EVERY_N  # detect on the first frame
+        resize_buf: np.ndarray | None = None
         try:
             while not self.stop_event.is_set():
-                # ── Grab frame ──
-                img = None
-                if cap and cap.isOpened():
-                    # Wrap cap.read() in thread with timeout to avoid blocking
-                    frame_result: dict = {}
-                    def _read_cap():
-                        ret, f = cap.read()
-                        if ret and f is not None:
-                            frame_result["frame"] = f
-                    rt = threading.Thread(target=_read_cap, daemon=True)
-                    rt.start()
-                    rt.join(timeout=2.0)
-                    if "frame" in frame_result:
-                        img = frame_result["frame"]
-                        cap_read_fails = 0
-                    else:
-                        cap_read_fails += 1
-                        if cap_read_fails >= 2:
-                            print(f"[MjpegStream] VideoCapture stuck, switching to HTTP polling", flush=True)
-                            cap.release()
-                            cap = None
-                            use_http = True
-                            http_client = httpx.Client()
-                elif http_client:
-                    try:
-                        resp = http_client.get(stream_url, timeout=2.0)
-                        if resp.status_code == 200:
-                            nparr = np.frombuffer(resp.content, np.uint8)
-                            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    except Exception:
-                        pass
-
-                if img is None:
-                    time.sleep(0.03)
+                # ── Take the newest captured frame (older ones are dropped) ──
+                if not self._frame_ready.wait(timeout=FRAME_WAIT_TIMEOUT):
+                    if use_cap and time.monotonic() - last_frame_at > CAPTURE_STALL_TIMEOUT:
+                        print(f"[MjpegStream] VideoCapture stuck, switching to HTTP polling", flush=True)
+                        use_cap = False
+                        last_frame_at = time.monotonic()
+                        self._start_capture(None, stream_url)
                     continue
+                # Clear before reading: a frame stored after this re-sets the event
+                self._frame_ready.clear()
+                seq, img = self._frame
+                if seq == last_seq:
+                    continue
+                last_seq = seq
+                last_frame_at = time.monotonic()
 
-                if fps_counter == 0:
-                    print(f"[MjpegStream] First frame received: {img.shape}", flush=True)
-
-                # Resize large frames for performance
-                h, w = img.shape[:2]
-                if w > MAX_PROCESS_WIDTH and not self.skip_yolo:
-                    scale = MAX_PROCESS_WIDTH / w
-                    img = cv2.resize(img, (MAX_PROCESS_WIDTH, int(h * scale)))
-                    h, w = img.shape[:2]
+                if first_frame:
+                    # fps_counter resets every second, so it cannot mark the first frame
+                    first_frame = False
+                    shape = f"{len(img)} bytes" if isinstance(img, bytes) else img.shape
+                    print(f"[MjpegStream] First frame received: {shape}", flush=True)
 
                 if self.skip_yolo:
                     # Raw video mode — no YOLO, no boxes
-                    _, jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                    with self.lock:
-                        self.latest_jpeg = jpeg.tobytes()
-                        self.person_count = 0
-                        self.total_count = 0
+                    if not isinstance(img, bytes):
+                        _, img = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+                    self._publish(img, (0, 0, 0))
                 else:
-                    # ── YOLO inference ──
-                    results = model(img, conf=CONFIDENCE, verbose=False)
-
-                    # Build set of all "named" class IDs for "other" filtering
-                    named_ids: set[int] = set()
-                    for ids in FILTER_CATEGORIES.values():
-                        named_ids |= ids
-                    has_other = self.allowed_classes is not None and -1 in self.allowed_classes
-
-                    detections = []
-                    for result in results:
-                        for box in result.boxes:
-                            cls_id = int(box.cls[0])
-
-                            # Filter by allowed classes
-                            if self.allowed_classes is not None:
-                                in_named = cls_id in self.allowed_classes
-                                in_other = has_other and cls_id not in named_ids
-                                if not in_named and not in_other:
-                                    continue
-
-                            x1, y1, x2, y2 = box.xyxy[0].tolist()
-                            conf_val = float(box.conf[0])
-                            cls_name = model.names.get(cls_id, "unknown")
-                            classified = classify_detection(cls_id, cls_name)
-                            if classified is None:
-                                continue
-                            det_type, label, color = classified
-                            detections.append({
-                                "type": det_type,
-                                "label": label,
-                                "confidence": conf_val,
-                                "bbox": {
-                                    "x": x1 / w, "y": y1 / h,
-                                    "w": (x2 - x1) / w, "h": (y2 - y1) / h,
-                                },
-                                "color": color,
-                            })
+                    # Resize large frames for performance
+                    frame = img
+                    img, gate = _prepare_frame(frame, resize_buf)
+                    if img is not frame:
+                        resize_buf = img  # drawn on and encoded below, then reused
+
+                    # ── YOLO inference on every DETECT_EVERY_N-th frame, skipped while static ──
+                    t = time.monotonic()
+                    frames_since_yolo += 1
+                    skip = frames_since_yolo < DETECT_EVERY_N or (
+                        prev_gate is not None
+                        and t - yolo_at < MOTION_HEARTBEAT
+                        and cv2.mean(cv2.absdiff(gate, prev_gate))[0] < MOTION_THRESHOLD
+                    )
+                    if not skip:
+                        yolo_detections = self._detect_objects(model, img)
+                        prev_gate = gate
+                        yolo_at = t
+                        frames_since_yolo = 0
+                    # Boxes are normalised, so cached ones redraw correctly on the new frame
+                    detections = list(yolo_detections)
 
                     # ── Fire/smoke detection (HSV-based) ──
-                    run_fire = self.allowed_classes is None or -3 in self.allowed_classes
-                    if run_fire:
-                        fire_result = detect_fire_smoke(img)
+                    if self.run_fire:
+                        # Fire and smoke evolve slowly — rescan a few times a second
+                        if fire_result is None or t - fire_checked_at >= FIRE_CHECK_INTERVAL:
+                            fire_result = detect_fire_smoke(img)
+                            fire_checked_at = t
                         if fire_result["fireDetected"]:
                             for region in fire_result["fireRegions"]:
                                 detections.append({
@@ -1083,16 +1159,11 @@ class MjpegStream:
                                 })
 
                     # ── Draw + encode ──
-                    annotated = draw_detections(img, detections)
+                    pc, fc = count_detection_types(detections)
+                    annotated = draw_detections(img, detections, (pc, fc))
                     _, jpeg = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, 85])
 
-                    pc = sum(1 for d in detections if d.get("type") == "person")
-                    fc = sum(1 for d in detections if d.get("type") in ("fire", "smoke"))
-                    with self.lock:
-                        self.latest_jpeg = jpeg.tobytes()
-                        self.person_count = pc
-                        self.total_count = len(detections)
-                        self.fire_count = fc
+                    self._publish(jpeg, (pc, len(detections), fc))
 
                 # FPS tracking + rate limiting
                 fps_counter += 1
@@ -1109,28 +1180,123 @@ class MjpegStream:
                     time.sleep(sleep_needed)
 
         finally:
-            if cap:
+            self._capture_gen += 1  # retire the capture thread
+
+    def _detect_objects(self, model, img: np.ndarray) -> list[dict]:
+        """Run YOLO on a frame and return detections allowed by the class filter."""
+        if not self.yolo_classes:
+            return []
+        small = yolo_input(img)
+        h, w = small.shape[:2]
+        results = model(small, conf=CONFIDENCE, classes=self.yolo_classes, verbose=False)
+
+        detections = []
+        for result in results:
+            for (x1, y1, x2, y2), conf_val, cls_id in yolo_boxes(result):
+                cls_name = model.names.get(cls_id, "unknown")
+                classified = classify_detection(cls_id, cls_name)
+                if classified is None:
+                    continue
+                det_type, label, color = classified
+                detections.append({
+                    "type": det_type,
+                    "label": label,
+                    "confidence": conf_val,
+                    "bbox": {
+                        "x": x1 / w, "y": y1 / h,
+                        "w": (x2 - x1) / w, "h": (y2 - y1) / h,
+                    },
+                    "color": color,
+                })
+        return detections
+
+    def _start_capture(self, cap: cv2.VideoCapture | None, stream_url: str):
+        """Start a capture thread (VideoCapture, or HTTP polling when cap is None),
+        retiring any previous one."""
+        self._capture_gen += 1
+        threading.Thread(
+            target=self._capture_loop, args=(cap, stream_url, self._capture_gen), daemon=True,
+        ).start()
+
+    def _capture_loop(self, cap: cv2.VideoCapture | None, stream_url: str, gen: int):
+        """Capture thread: keep only the newest frame in the slot.
+
+        Runs the blocking read independently of YOLO so neither waits on the
+        other. A thread stuck in cap.read() is replaced by an HTTP poller from
+        the worker and exits on its own once the read returns.
+        """
+        try:
+            while not self.stop_event.is_set() and self._capture_gen == gen:
+                started = time.monotonic()
+                img = None
+                if cap is not None:
+                    ret, f = cap.read()
+                    if ret and f is not None:
+                        img = f
+                else:
+                    try:
+                        resp = _snapshot_client.get(stream_url)
+                        if resp.status_code == 200:
+                            if self.skip_yolo:
+                                # Raw mode re-serves the camera's JPEG as-is: no decode/encode
+                                if resp.content[:2] == b"\xff\xd8":
+                                    img = resp.content
+                            else:
+                                nparr = np.frombuffer(resp.content, np.uint8)
+                                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                    except Exception:
+                        pass
+
+                if img is None:
+                    time.sleep(0.03)
+                    continue
+
+                self._frame = (self._frame[0] + 1, img)
+                self._frame_ready.set()
+
+                # VideoCapture must be drained continuously; snapshot polling is capped
+                if cap is None:
+                    sleep_needed = MIN_FRAME_INTERVAL - (time.monotonic() - started)
+                    if sleep_needed > 0:
+                        time.sleep(sleep_needed)
+        finally:
+            if cap is not None:
                 cap.release()
-            if http_client:
-                http_client.close()
+
+    def _publish(self, jpeg: bytes | np.ndarray, counts: tuple[int, int, int]):
+        """Hand a finished frame to the output side (worker thread only).
+
+        ``jpeg`` may be the uint8 array from cv2.imencode; join copies it straight
+        into the part, without an intermediate tobytes().
+        """
+        part = b"".join((
+            b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n"
+            b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n"
+            b"\r\n",
+            jpeg,
+            b"\r\n",
+        ))
+        self.latest_part = (self.latest_part[0] + 1, part)
+        self.counts = counts
 
     async def generate(self):
-        """Async generator: output latest JPEG at 30fps."""
+        """Async generator: check for a new frame at 30fps and send only new ones."""
+        last_seq = 0
         while not self.stop_event.is_set():
-            with self.lock:
-                jpeg_bytes = self.latest_jpeg
-
-            if jpeg_bytes:
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n"
-                    b"Content-Length: " + str(len(jpeg_bytes)).encode() + b"\r\n"
-                    b"\r\n" + jpeg_bytes + b"\r\n"
-                )
+            seq, part = self.latest_part
+            if part is not None and seq != last_seq:
+                last_seq = seq
+                yield part
 
             await asyncio.sleep(FRAME_INTERVAL)
 
 
+@app.on_event("shutdown")
+def _close_snapshot_client():
+    _snapshot_client.close()
+
+
 # Active streams registry (protected by _streams_lock)
 _active_streams: dict[str, MjpegStream] = {}
 _streams_lock = threading.Lock()
@@ -1145,15 +1311,15 @@ async def stream_mjpeg(
     allowed = parse_class_filter(classes)
     stream_key = f"{camera_url}|{classes or 'all'}"
 
-    # Stop existing stream for this camera+filter combo
+    # Swap in the new stream under the lock. stop() joins the worker (up to 3 s),
+    # so it runs in the threadpool rather than blocking the event loop.
+    prefix = camera_url + "|"
+    stream = MjpegStream(camera_url, allowed_classes=allowed)
     with _streams_lock:
-        for key in list(_active_streams.keys()):
-            if key.startswith(camera_url + "|"):
-                _active_streams[key].stop()
-                del _active_streams[key]
-
-        stream = MjpegStream(camera_url, allowed_classes=allowed)
+        stale = [_active_streams.pop(key) for key in list(_active_streams) if key.startswith(prefix)]
         _active_streams[stream_key] = stream
+    for old in stale:
+        await run_in_threadpool(old.stop)
     stream.start()
 
     async def _guarded_generate():
@@ -1164,9 +1330,10 @@ async def stream_mjpeg(
         except (asyncio.CancelledError, GeneratorExit):
             pass
         finally:
-            stream.stop()
             with _streams_lock:
-                _active_streams.pop(stream_key, None)
+                if _active_streams.get(stream_key) is stream:
+                    del _active_streams[stream_key]
+            await run_in_threadpool(stream.stop)
 
     return StreamingResponse(
         _guarded_generate(),
@@ -1182,15 +1349,16 @@ async def stream_mjpeg(
 @app.get("/stream/counts")
 async def stream_counts(camera_url: str = Query(..., description="Camera base URL")):
     """Return real-time detection counts for an active MJPEG stream."""
+    prefix = camera_url + "|"
     with _streams_lock:
-        for key, stream in _active_streams.items():
-            if key.startswith(camera_url + "|"):
-                with stream.lock:
-                    return {
-                        "personCount": stream.person_count,
-                        "totalCount": stream.total_count,
-                        "fireCount": stream.fire_count,
-                    }
+        stream = next((s for key, s in _active_streams.items() if key.startswith(prefix)), None)
+    if stream is not None:
+        person_count, total_count, fire_count = stream.counts
+        return {
+            "personCount": person_count,
+            "totalCount": total_count,
+            "fireCount": fire_count,
+        }
     return {"personCount": 0, "totalCount": 0, "fireCount": 0}
 
 
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
-"""Export YOLOv8n to ONNX format for browser-side inference via ONNX Runtime Web."""
+"""Export YOLOv8n to ONNX format for browser-side inference via ONNX Runtime Web.
 
+With --int8 DIR, also writes yolov8n_int8.onnx: a static QDQ INT8 model
+calibrated on the images in DIR (a few hundred camera frames is plenty).
+Serve it by setting NEXT_PUBLIC_YOLO_MODEL_URL=/models/yolov8n_int8.onnx.
+"""
+
+import argparse
 import sys
 from pathlib import Path
 
@@ -11,23 +17,94 @@ except ImportError:
     sys.exit(1)
 
 OUT_DIR = Path(__file__).resolve().parent.parent / "public" / "models"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-model = YOLO("yolov8n.pt")
-model.export(
-    format="onnx",
-    imgsz=640,
-    simplify=True,
-    opset=17,
-    dynamic=False,
-)
-
-# ultralytics saves next to .pt — move to public/models/
-src = Path("yolov8n.onnx")
-dst = OUT_DIR / "yolov8n.onnx"
-if src.exists():
-    src.rename(dst)
-    print(f"Saved: {dst}  ({dst.stat().st_size / 1024 / 1024:.1f} MB)")
-else:
-    print("ERROR: yolov8n.onnx not found after export")
-    sys.exit(1)
+INPUT_SIZE = 640
+CALIB_MAX_IMAGES = 300
+
+
+def quantize_int8(fp32_path: Path, calib_dir: Path) -> None:
+    try:
+        import cv2
+        import numpy as np
+        from onnxruntime.quantization import (
+            CalibrationDataReader, QuantFormat, QuantType, quantize_static,
+        )
+    except ImportError:
+        print("Install onnxruntime and opencv-python: pip install onnxruntime opencv-python")
+        sys.exit(1)
+
+    images = sorted(
+        p for p in calib_dir.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
+    )[:CALIB_MAX_IMAGES]
+    if not images:
+        print(f"ERROR: no calibration images in {calib_dir}")
+        sys.exit(1)
+
+    class FrameReader(CalibrationDataReader):
+        """Feeds calibration frames preprocessed exactly like browser-yolo.ts."""
+
+        def __init__(self):
+            self._paths = iter(images)
+
+        def get_next(self):
+            for path in self._paths:
+                img = cv2.imread(str(path))
+                if img is None:
+                    continue
+                # Letterbox onto black, RGB, CHW, [0, 1]
+                h, w = img.shape[:2]
+                scale = min(INPUT_SIZE / w, INPUT_SIZE / h)
+                nw, nh = round(w * scale), round(h * scale)
+                canvas = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), np.uint8)
+                px, py = (INPUT_SIZE - nw) // 2, (INPUT_SIZE - nh) // 2
+                canvas[py:py + nh, px:px + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_AREA)
+                rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
+                blob = rgb.transpose(2, 0, 1)[None].astype(np.float32) * np.float32(1 / 255)
+                return {"images": blob}
+            return None
+
+    dst = OUT_DIR / "yolov8n_int8.onnx"
+    quantize_static(
+        str(fp32_path),
+        str(dst),
+        FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+    )
+    print(f"Saved: {dst}  ({dst.stat().st_size / 1024 / 1024:.1f} MB, {len(images)} calibration images)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLOv8n to ONNX for the browser")
+    parser.add_argument("--int8", type=Path, metavar="CALIB_DIR",
+                        help="also write an INT8 model calibrated on images in CALIB_DIR")
+    args = parser.parse_args()
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    model = YOLO("yolov8n.pt")
+    model.export(
+        format="onnx",
+        imgsz=INPUT_SIZE,
+        simplify=True,
+        opset=17,
+        dynamic=False,
+    )
+
+    # ultralytics saves next to .pt — move to public/models/
+    src = Path("yolov8n.onnx")
+    dst = OUT_DIR / "yolov8n.onnx"
+    if src.exists():
+        src.rename(dst)
+        print(f"Saved: {dst}  ({dst.stat().st_size / 1024 / 1024:.1f} MB)")
+    else:
+        print("ERROR: yolov8n.onnx not found after export")
+        sys.exit(1)
+
+    if args.int8:
+        quantize_int8(dst, args.int8)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { createHash } from 'crypto';
 import { prisma } from '@/lib/prisma';
 import { getAuthSession, unauthorized } from '@/lib/api-utils';
 import { checkPermission, RBACError } from '@/lib/rbac';
 
-export async function GET(_req: NextRequest) {
+export async function GET(req: NextRequest) {
   const session = await getAuthSession();
   if (!session) return unauthorized();
 
@@ -28,6 +29,18 @@ export async function GET(_req: NextRequest) {
     },
   });
 
+  // Clients poll this roster; hash the stored rows so an unchanged roster
+  // costs a 304 instead of re-serialising and re-parsing every descriptor
+  const hash = createHash('sha1');
+  for (const p of persons) {
+    hash.update(`${p.id}\0${p.name}\0${p.integrationId ?? ''}\0${p.faceDescriptor}\n`);
+  }
+  const etag = `"${hash.digest('base64url')}"`;
+
+  if (req.headers.get('if-none-match') === etag) {
+    return new NextResponse(null, { status: 304, headers: { ETag: etag } });
+  }
+
   const result = persons.map((p) => ({
     id: p.id,
     name: p.name,
@@ -35,5 +48,5 @@ export async function GET(_req: NextRequest) {
     integrationId: p.integrationId,
   }));
 
-  return NextResponse.json(result);
+  return NextResponse.json(result, { headers: { ETag: etag } });
 }
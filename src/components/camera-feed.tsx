@@ -2,13 +2,6 @@
 
 import { useEffect, useRef, useCallback, useState } from 'react';
 
-// Face descriptor matching types
-interface TrackedFace {
-  id: number;
-  descriptor: Float32Array;
-  lastSeen: number;
-}
-
 // Search descriptor from person search feature
 export interface SearchDescriptor {
   id: string;
@@ -16,69 +9,144 @@ export interface SearchDescriptor {
   descriptor: number[];
 }
 
-// Global face registry (persists across component instances within the session)
-const faceRegistry: TrackedFace[] = [];
+const FACE_DESCRIPTOR_DIM = 128;
+
+// Global face registry (persists across component instances within the session).
+// Struct-of-arrays: row i is ids[i], lastSeen[i] and descriptors[i*DIM .. +DIM],
+// so matching scans one contiguous buffer and updates rows in place.
+const faceRegistry = {
+  count: 0,
+  ids: new Int32Array(64),
+  lastSeen: new Float64Array(64),
+  descriptors: new Float32Array(64 * FACE_DESCRIPTOR_DIM),
+};
 let nextFaceId = 1;
 
+function growFaceRegistry() {
+  const capacity = faceRegistry.ids.length * 2;
+  const ids = new Int32Array(capacity);
+  const lastSeen = new Float64Array(capacity);
+  const descriptors = new Float32Array(capacity * FACE_DESCRIPTOR_DIM);
+  ids.set(faceRegistry.ids);
+  lastSeen.set(faceRegistry.lastSeen);
+  descriptors.set(faceRegistry.descriptors);
+  faceRegistry.ids = ids;
+  faceRegistry.lastSeen = lastSeen;
+  faceRegistry.descriptors = descriptors;
+}
+
 const MATCH_THRESHOLD = 0.6;
 const SEARCH_MATCH_THRESHOLD = 0.5; // Stricter for person search
+// Matching compares squared distances, so no sqrt is taken per row
+const MATCH_THRESHOLD_SQ = MATCH_THRESHOLD * MATCH_THRESHOLD;
+const SEARCH_MATCH_THRESHOLD_SQ = SEARCH_MATCH_THRESHOLD * SEARCH_MATCH_THRESHOLD;
 const FACE_EXPIRY_MS = 30000; // Remove faces not seen for 30s
 
-function euclideanDistance(a: Float32Array, b: Float32Array): number {
-  let sum = 0;
-  for (let i = 0; i < a.length; i++) {
-    const diff = a[i] - b[i];
-    sum += diff * diff;
+/**
+ * Squared L2 distance between `a` and `dim` values of `b` starting at
+ * `offset`. Unrolled by 4 with independent accumulators so the JIT can
+ * overlap the multiply-adds; descriptors are 128-d.
+ */
+function squaredDistance(a: Float32Array, b: Float32Array, offset: number, dim: number): number {
+  let s0 = 0;
+  let s1 = 0;
+  let s2 = 0;
+  let s3 = 0;
+  let i = 0;
+  for (; i + 3 < dim; i += 4) {
+    const d0 = a[i] - b[offset + i];
+    const d1 = a[i + 1] - b[offset + i + 1];
+    const d2 = a[i + 2] - b[offset + i + 2];
+    const d3 = a[i + 3] - b[offset + i + 3];
+    s0 += d0 * d0;
+    s1 += d1 * d1;
+    s2 += d2 * d2;
+    s3 += d3 * d3;
+  }
+  for (; i < dim; i++) {
+    const d = a[i] - b[offset + i];
+    s0 += d * d;
   }
-  return Math.sqrt(sum);
+  return s0 + s1 + s2 + s3;
 }
 
-function euclideanDistanceMixed(a: Float32Array, b: number[]): number {
-  let sum = 0;
-  for (let i = 0; i < a.length; i++) {
-    const diff = a[i] - b[i];
-    sum += diff * diff;
+/** Dot product of `a` with `dim` values of `b` starting at `offset` (unrolled like squaredDistance). */
+function dotProduct(a: Float32Array, b: Float32Array, offset: number, dim: number): number {
+  let s0 = 0;
+  let s1 = 0;
+  let s2 = 0;
+  let s3 = 0;
+  let i = 0;
+  for (; i + 3 < dim; i += 4) {
+    s0 += a[i] * b[offset + i];
+    s1 += a[i + 1] * b[offset + i + 1];
+    s2 += a[i + 2] * b[offset + i + 2];
+    s3 += a[i + 3] * b[offset + i + 3];
   }
-  return Math.sqrt(sum);
+  for (; i < dim; i++) {
+    s0 += a[i] * b[offset + i];
+  }
+  return s0 + s1 + s2 + s3;
 }
 
 function matchOrCreateFace(descriptor: Float32Array): number {
   const now = Date.now();
-
-  // Clean expired faces
-  for (let i = faceRegistry.length - 1; i >= 0; i--) {
-    if (now - faceRegistry[i].lastSeen > FACE_EXPIRY_MS) {
-      faceRegistry.splice(i, 1);
+  const reg = faceRegistry;
+  const dim = FACE_DESCRIPTOR_DIM;
+
+  // Clean expired faces: move the last row into the freed slot
+  for (let i = reg.count - 1; i >= 0; i--) {
+    if (now - reg.lastSeen[i] > FACE_EXPIRY_MS) {
+      const last = --reg.count;
+      if (i !== last) {
+        reg.ids[i] = reg.ids[last];
+        reg.lastSeen[i] = reg.lastSeen[last];
+        reg.descriptors.copyWithin(i * dim, last * dim, (last + 1) * dim);
+      }
     }
   }
 
   // Find best match
-  let bestMatch: TrackedFace | null = null;
-  let bestDistance = Infinity;
-
-  for (const face of faceRegistry) {
-    const dist = euclideanDistance(descriptor, face.descriptor);
-    if (dist < bestDistance) {
-      bestDistance = dist;
-      bestMatch = face;
+  let bestRow = -1;
+  let bestD2 = Infinity;
+
+  for (let row = 0, offset = 0; row < reg.count; row++, offset += dim) {
+    const d2 = squaredDistance(descriptor, reg.descriptors, offset, dim);
+    if (d2 < bestD2) {
+      bestD2 = d2;
+      bestRow = row;
     }
   }
 
-  if (bestMatch && bestDistance < MATCH_THRESHOLD) {
-    bestMatch.lastSeen = now;
-    bestMatch.descriptor = descriptor; // Update descriptor
-    return bestMatch.id;
+  if (bestRow >= 0 && bestD2 < MATCH_THRESHOLD_SQ) {
+    reg.lastSeen[bestRow] = now;
+    reg.descriptors.set(descriptor.subarray(0, dim), bestRow * dim); // Update descriptor
+    return reg.ids[bestRow];
   }
 
   // New face
+  if (reg.count === reg.ids.length) growFaceRegistry();
+  const row = reg.count++;
   const id = nextFaceId++;
-  faceRegistry.push({ id, descriptor, lastSeen: now });
+  reg.ids[row] = id;
+  reg.lastSeen[row] = now;
+  reg.descriptors.set(descriptor.subarray(0, dim), row * dim);
   return id;
 }
 
 // Debounce sighting reports: once per person per camera per 60s
 const sightingDebounce = new Map<string, number>();
 const SIGHTING_DEBOUNCE_MS = 60000;
+let lastSightingPrune = 0;
+
+// Drop expired debounce entries so the map does not grow for the whole session
+function pruneSightingDebounce(now: number) {
+  if (now - lastSightingPrune < SIGHTING_DEBOUNCE_MS) return;
+  lastSightingPrune = now;
+  for (const [key, reportedAt] of sightingDebounce) {
+    if (now - reportedAt >= SIGHTING_DEBOUNCE_MS) sightingDebounce.delete(key);
+  }
+}
 
 interface CameraFeedProps {
   cameraId: string;
@@ -117,25 +185,74 @@ async function loadFaceApi() {
   return faceApiPromise;
 }
 
-function findSearchMatch(
-  descriptor: Float32Array,
-  searchDescriptors: SearchDescriptor[]
-): { person: SearchDescriptor; distance: number } | null {
-  let bestMatch: SearchDescriptor | null = null;
-  let bestDistance = Infinity;
-
-  for (const sd of searchDescriptors) {
-    const dist = euclideanDistanceMixed(descriptor, sd.descriptor);
-    if (dist < bestDistance) {
-      bestDistance = dist;
-      bestMatch = sd;
+// Search descriptors packed row-major into one Float32Array, so matching
+// scans contiguous memory instead of chasing number[] per person.
+interface SearchGallery {
+  people: SearchDescriptor[];
+  matrix: Float32Array;
+  /** ||row||² per person, so a query needs only one dot product per row. */
+  sqNorms: Float64Array;
+  dim: number;
+}
+
+// Built once per descriptors array (the hook replaces the array on refetch)
+const galleryCache = new WeakMap<SearchDescriptor[], SearchGallery>();
+
+function getSearchGallery(searchDescriptors: SearchDescriptor[]): SearchGallery {
+  let gallery = galleryCache.get(searchDescriptors);
+  if (!gallery) {
+    const dim = searchDescriptors[0]?.descriptor.length ?? 0;
+    const matrix = new Float32Array(searchDescriptors.length * dim);
+    const sqNorms = new Float64Array(searchDescriptors.length);
+    searchDescriptors.forEach((sd, row) => {
+      const offset = row * dim;
+      matrix.set(sd.descriptor.slice(0, dim), offset);
+      const rowView = matrix.subarray(offset, offset + dim);
+      sqNorms[row] = dotProduct(rowView, rowView, 0, dim);
+    });
+    gallery = { people: searchDescriptors, matrix, sqNorms, dim };
+    galleryCache.set(searchDescriptors, gallery);
+  }
+  return gallery;
+}
+
+type SearchMatch = { person: SearchDescriptor; distance: number };
+
+// Match every face of a frame in one pass over the gallery: each gallery row
+// is read once and scored against all probes, instead of one full scan per face.
+function findSearchMatches(
+  probes: Float32Array[],
+  gallery: SearchGallery
+): (SearchMatch | null)[] {
+  const { people, matrix, sqNorms, dim } = gallery;
+  const probeSqNorms = new Float64Array(probes.length);
+  const bestRows = new Int32Array(probes.length).fill(-1);
+  const bestD2 = new Float64Array(probes.length).fill(Infinity);
+  for (let p = 0; p < probes.length; p++) {
+    probeSqNorms[p] = dotProduct(probes[p], probes[p], 0, dim);
+  }
+
+  // ||q - k||² = ||q||² + ||k||² - 2·q·k, with ||k||² cached per gallery
+  for (let row = 0, offset = 0; row < people.length; row++, offset += dim) {
+    const rowSqNorm = sqNorms[row];
+    for (let p = 0; p < probes.length; p++) {
+      const d2 = probeSqNorms[p] + rowSqNorm - 2 * dotProduct(probes[p], matrix, offset, dim);
+      if (d2 < bestD2[p]) {
+        bestD2[p] = d2;
+        bestRows[p] = row;
+      }
     }
   }
 
-  if (bestMatch && bestDistance < SEARCH_MATCH_THRESHOLD) {
-    return { person: bestMatch, distance: bestDistance };
+  const matches: (SearchMatch | null)[] = new Array(probes.length);
+  for (let p = 0; p < probes.length; p++) {
+    // sqrt only for a reported match (the distance feeds its confidence)
+    matches[p] =
+      bestRows[p] >= 0 && bestD2[p] < SEARCH_MATCH_THRESHOLD_SQ
+        ? { person: people[bestRows[p]], distance: Math.sqrt(Math.max(bestD2[p], 0)) }
+        : null;
   }
-  return null;
+  return matches;
 }
 
 async function reportSighting(
@@ -145,6 +262,7 @@ async function reportSighting(
 ) {
   const key = `${personId}:${cameraId}`;
   const now = Date.now();
+  pruneSightingDebounce(now);
   const lastReport = sightingDebounce.get(key);
   if (lastReport && now - lastReport < SIGHTING_DEBOUNCE_MS) return;
 
@@ -245,18 +363,26 @@ export function CameraFeed({
         onFacesDetected?.(count);
 
         const currentSearchDescs = searchDescriptorsRef.current;
+        const searchGallery =
+          currentSearchDescs && currentSearchDescs.length > 0
+            ? getSearchGallery(currentSearchDescs)
+            : null;
+        const searchMatches = searchGallery
+          ? findSearchMatches(detections.map((d) => d.descriptor), searchGallery)
+          : null;
         const foundNames: string[] = [];
 
         // Draw face rectangles
-        for (const detection of detections) {
+        for (let i = 0; i < detections.length; i++) {
+          const detection = detections[i];
           const { x, y, width, height } = detection.detection.box;
 
           // Check against search descriptors first
           let isSearchMatch = false;
           let matchName = '';
 
-          if (currentSearchDescs && currentSearchDescs.length > 0) {
-            const match = findSearchMatch(detection.descriptor, currentSearchDescs);
+          if (searchMatches) {
+            const match = searchMatches[i];
             if (match) {
               isSearchMatch = true;
               matchName = match.person.name;
@@ -1,7 +1,6 @@
 'use client';
 
-import { useState, useEffect, useCallback } from 'react';
-import { apiGet } from '@/lib/api-client';
+import { useState, useEffect, useCallback, useRef } from 'react';
 
 export interface SearchDescriptor {
   id: string;
@@ -14,10 +13,19 @@ const REFRESH_INTERVAL_MS = 30000; // 30 seconds
 
 export function useSearchDescriptors() {
   const [descriptors, setDescriptors] = useState<SearchDescriptor[]>([]);
+  const etagRef = useRef<string | null>(null);
 
   const fetch = useCallback(async () => {
     try {
-      const data = await apiGet<SearchDescriptor[]>('/api/person-search/descriptors');
+      // Conditional request: a 304 keeps the current array (and the match
+      // gallery built from it) instead of re-parsing the whole roster
+      const response = await window.fetch('/api/person-search/descriptors', {
+        credentials: 'include',
+        headers: etagRef.current ? { 'If-None-Match': etagRef.current } : undefined,
+      });
+      if (response.status === 304 || !response.ok) return;
+      const data: SearchDescriptor[] = await response.json();
+      etagRef.current = response.headers.get('ETag');
       setDescriptors(data);
     } catch {
       // Silent fail — descriptors just won't update
@@ -60,7 +60,8 @@ const COCO_CLASSES: Record<number, { type: string; label: string; color: string
 // All COCO class IDs we care about
 const ENABLED_CLASS_IDS = new Set(Object.keys(COCO_CLASSES).map(Number));
 
-const MODEL_URL = '/models/yolov8n.onnx';
+// FP32 by default; point at yolov8n_int8.onnx (scripts/export-yolov8n-onnx.py --int8) for INT8
+const MODEL_URL = process.env.NEXT_PUBLIC_YOLO_MODEL_URL || '/models/yolov8n.onnx';
 const INPUT_SIZE = 640;
 const CONF_THRESHOLD = 0.35;
 const IOU_THRESHOLD = 0.5;
@@ -76,7 +77,7 @@ type OrtModule = {
   };
   Tensor: new (type: string, data: Float32Array, dims: number[]) => unknown;
   env: {
-    wasm: { wasmPaths: string };
+    wasm: { wasmPaths: string; numThreads: number };
   };
 };
 
@@ -97,6 +98,8 @@ class BrowserYolo {
   private _backend: 'webgpu' | 'wasm' | null = null;
   private canvas: OffscreenCanvas | null = null;
   private ctx: OffscreenCanvasRenderingContext2D | null = null;
+  /** CHW input tensor data, reused across calls; null while a run holds it */
+  private inputBuffer: Float32Array | null = null;
 
   get backend(): string | null {
     return this._backend;
@@ -124,6 +127,9 @@ class BrowserYolo {
 
     // Set WASM paths
     ort.env.wasm.wasmPaths = 'https://cdn.jsdelivr.net/npm/onnxruntime-web@1.24.1/dist/';
+    // Multi-threaded WASM kernels (used only when the page is cross-origin isolated);
+    // leave half the cores for decoding, drawing and the UI thread
+    ort.env.wasm.numThreads = Math.max(1, Math.floor((navigator.hardwareConcurrency || 2) / 2));
 
     // Try WebGPU first, fall back to WASM
     const backends: Array<{ name: 'webgpu' | 'wasm'; ep: string }> = [
@@ -136,6 +142,8 @@ class BrowserYolo {
         console.log(`[BrowserYOLO] Trying ${name} backend...`);
         this.session = await ort.InferenceSession.create(MODEL_URL, {
           executionProviders: [ep],
+          // Fuse conv/activation and fold constants once at load time
+          graphOptimizationLevel: 'all',
         });
         this._backend = name;
         console.log(`[BrowserYOLO] Model loaded (${name})`);
@@ -186,20 +194,28 @@ class BrowserYolo {
     const pixels = imageData.data;
 
     // Convert RGBA → CHW float32 normalized [0, 1]
-    const inputSize = 3 * INPUT_SIZE * INPUT_SIZE;
-    const float32Data = new Float32Array(inputSize);
     const area = INPUT_SIZE * INPUT_SIZE;
-
-    for (let i = 0; i < area; i++) {
-      const ri = i * 4;
-      float32Data[i] = pixels[ri] / 255;           // R
-      float32Data[area + i] = pixels[ri + 1] / 255; // G
-      float32Data[2 * area + i] = pixels[ri + 2] / 255; // B
+    // Concurrent detect() calls (several feeds share this singleton) get their own buffer
+    const float32Data = this.inputBuffer ?? new Float32Array(3 * area);
+    this.inputBuffer = null;
+
+    // Single pass: channel split, scale and cast fused per pixel
+    const inv = 1 / 255;
+    const area2 = 2 * area;
+    for (let i = 0, ri = 0; i < area; i++, ri += 4) {
+      float32Data[i] = pixels[ri] * inv;             // R
+      float32Data[area + i] = pixels[ri + 1] * inv;  // G
+      float32Data[area2 + i] = pixels[ri + 2] * inv; // B
     }
 
     const inputTensor = new ort.Tensor('float32', float32Data, [1, 3, INPUT_SIZE, INPUT_SIZE]);
 
-    const results = await this.session.run({ images: inputTensor });
+    let results: Awaited<ReturnType<OrtSession['run']>>;
+    try {
+      results = await this.session.run({ images: inputTensor });
+    } finally {
+      this.inputBuffer = float32Data;
+    }
 
     // YOLOv8 output shape: [1, 84, 8400] — 84 = 4 bbox + 80 classes
     const output = results[Object.keys(results)[0]];
@@ -266,19 +282,34 @@ class BrowserYolo {
   private nms(detections: Detection[]): Detection[] {
     detections.sort((a, b) => b.confidence - a.confidence);
     const kept: Detection[] = [];
+    // x1, y1, x2, y2, area of each kept box, computed once rather than per comparison
+    const keptBoxes: number[] = [];
 
     for (const det of detections) {
-      const dominated = kept.some(k => {
-        if (k.type !== det.type) return false;
-        const x1 = Math.max(k.bbox.x, det.bbox.x);
-        const y1 = Math.max(k.bbox.y, det.bbox.y);
-        const x2 = Math.min(k.bbox.x + k.bbox.w, det.bbox.x + det.bbox.w);
-        const y2 = Math.min(k.bbox.y + k.bbox.h, det.bbox.y + det.bbox.h);
-        const inter = Math.max(0, x2 - x1) * Math.max(0, y2 - y1);
-        const union = k.bbox.w * k.bbox.h + det.bbox.w * det.bbox.h - inter;
-        return union > 0 && inter / union > IOU_THRESHOLD;
-      });
-      if (!dominated) kept.push(det);
+      const { x, y, w, h } = det.bbox;
+      const x2 = x + w;
+      const y2 = y + h;
+      const area = w * h;
+      let dominated = false;
+
+      for (let k = 0, o = 0; k < kept.length; k++, o += 5) {
+        if (kept[k].type !== det.type) continue;
+        const iw = Math.min(keptBoxes[o + 2], x2) - Math.max(keptBoxes[o], x);
+        if (iw <= 0) continue;
+        const ih = Math.min(keptBoxes[o + 3], y2) - Math.max(keptBoxes[o + 1], y);
+        if (ih <= 0) continue;
+        const inter = iw * ih;
+        const union = keptBoxes[o + 4] + area - inter;
+        if (union > 0 && inter / union > IOU_THRESHOLD) {
+          dominated = true;
+          break;
+        }
+      }
+
+      if (!dominated) {
+        kept.push(det);
+        keptBoxes.push(x, y, x2, y2, area);
+      }
     }
 
     return kept;
@@ -290,6 +321,7 @@ class BrowserYolo {
     this._backend = null;
     this.canvas = null;
     this.ctx = null;
+    this.inputBuffer = null;
   }
 }
 
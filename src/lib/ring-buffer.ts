@@ -0,0 +1,40 @@
+/**
+ * Fixed-capacity ring buffer: pushing past capacity overwrites the oldest item
+ * in O(1), where Array#shift would move every remaining element.
+ * Iterates oldest → newest.
+ */
+export class RingBuffer<T> {
+  private items: T[] = [];
+  private start = 0;
+
+  constructor(private capacity: number) {}
+
+  get length(): number {
+    return this.items.length;
+  }
+
+  push(item: T): void {
+    if (this.items.length < this.capacity) {
+      this.items.push(item);
+    } else {
+      this.items[this.start] = item;
+      this.start = (this.start + 1) % this.capacity;
+    }
+  }
+
+  clear(): void {
+    this.items = [];
+    this.start = 0;
+  }
+
+  *[Symbol.iterator](): Iterator<T> {
+    const n = this.items.length;
+    for (let i = 0; i < n; i++) {
+      yield this.items[(this.start + i) % n];
+    }
+  }
+
+  toArray(): T[] {
+    return this.items.slice(this.start).concat(this.items.slice(0, this.start));
+  }
+}
@@ -6,6 +6,8 @@
  * to calculate real-time occupancy and hourly/daily statistics.
  */
 
+import { RingBuffer } from '@/lib/ring-buffer';
+
 const MAX_EVENTS_PER_CAMERA = 5000;
 
 export type CrossingDirection = 'in' | 'out';
@@ -18,7 +20,7 @@ interface CrossingEvent {
 interface OccupancyState {
   totalIn: number;
   totalOut: number;
-  events: CrossingEvent[];
+  events: RingBuffer<CrossingEvent>;
 }
 
 interface HourlyCrossingStat {
@@ -47,7 +49,7 @@ class OccupancyTracker {
   recordCrossing(cameraId: string, direction: CrossingDirection, timestamp?: Date): void {
     let state = this.states.get(cameraId);
     if (!state) {
-      state = { totalIn: 0, totalOut: 0, events: [] };
+      state = { totalIn: 0, totalOut: 0, events: new RingBuffer<CrossingEvent>(MAX_EVENTS_PER_CAMERA) };
       this.states.set(cameraId, state);
     }
 
@@ -57,12 +59,8 @@ class OccupancyTracker {
       state.totalOut++;
     }
 
+    // Circular buffer: overwrites the oldest event once full
     state.events.push({ direction, timestamp: timestamp ?? new Date() });
-
-    // Circular buffer
-    if (state.events.length > MAX_EVENTS_PER_CAMERA) {
-      state.events.shift();
-    }
   }
 
   getOccupancy(cameraId: string): { currentOccupancy: number; totalIn: number; totalOut: number } {
@@ -143,7 +141,7 @@ class OccupancyTracker {
     if (state) {
       state.totalIn = 0;
       state.totalOut = 0;
-      state.events = [];
+      state.events.clear();
     }
   }
 
@@ -5,6 +5,8 @@
  * Provides current count, hourly stats, and daily stats.
  */
 
+import { RingBuffer } from '@/lib/ring-buffer';
+
 const MAX_READINGS_PER_CAMERA = 1000;
 
 interface CountReading {
@@ -28,7 +30,7 @@ interface DailyStat {
 class PeopleCounter {
   private static instance: PeopleCounter;
   /** Circular buffer of readings per camera */
-  private readings = new Map<string, CountReading[]>();
+  private readings = new Map<string, RingBuffer<CountReading>>();
   /** Most recent count per camera for quick access */
   private currentCounts = new Map<string, number>();
 
@@ -48,17 +50,13 @@ class PeopleCounter {
 
     let buffer = this.readings.get(cameraId);
     if (!buffer) {
-      buffer = [];
+      buffer = new RingBuffer<CountReading>(MAX_READINGS_PER_CAMERA);
       this.readings.set(cameraId, buffer);
     }
 
+    // Circular buffer: overwrites the oldest reading once full
     buffer.push(reading);
 
-    // Circular buffer: remove oldest when exceeding max
-    if (buffer.length > MAX_READINGS_PER_CAMERA) {
-      buffer.shift();
-    }
-
     // Update current count
     this.currentCounts.set(cameraId, count);
   }
@@ -78,7 +76,7 @@ class PeopleCounter {
    * @param date - Date string in "YYYY-MM-DD" format
    */
   getHourlyStats(cameraId: string, date: string): HourlyStat[] {
-    const buffer = this.readings.get(cameraId) || [];
+    const buffer = this.readings.get(cameraId)?.toArray() ?? [];
     const targetDate = new Date(date + 'T00:00:00');
     const targetDateStr = targetDate.toISOString().slice(0, 10);
 
@@ -115,7 +113,7 @@ class PeopleCounter {
    * @param days - Number of days to include (from today going back)
    */
   getDailyStats(cameraId: string, days: number): DailyStat[] {
-    const buffer = this.readings.get(cameraId) || [];
+    const buffer = this.readings.get(cameraId)?.toArray() ?? [];
     const now = new Date();
     const stats: DailyStat[] = [];
 
@@ -8,7 +8,7 @@
 
 import * as crypto from 'crypto';
 import * as http from 'http';
-import { getProfiles } from './onvif-manager';
+import { getProfiles, type OnvifMediaProfile } from './onvif-manager';
 
 // ---------------------------------------------------------------------------
 // Types
@@ -92,25 +92,42 @@ function buildDigestAuthHeader(
   ].join(', ');
 }
 
+/**
+ * Keep-alive pool for PTZ SOAP calls. Move/stop pairs arrive in quick
+ * succession, so reusing the socket avoids a TCP handshake per command.
+ */
+const ptzAgent = new http.Agent({ keepAlive: true, maxSockets: 4 });
+
+/** Cameras answer PTZ commands in well under a second; fail fast otherwise. */
+const PTZ_TIMEOUT_MS = 3000;
+
 function httpPost(
   host: string,
   port: number,
   path: string,
-  body: string,
-  authorization?: string
+  body: Buffer,
+  authorization?: string,
+  readBody = true
 ): Promise<{ statusCode: number; headers: http.IncomingHttpHeaders; body: string }> {
   return new Promise((resolve, reject) => {
     const headers: Record<string, string> = {
       'Content-Type': 'application/soap+xml; charset=utf-8',
-      'Content-Length': Buffer.byteLength(body).toString(),
+      'Content-Length': body.length.toString(),
     };
     if (authorization) {
       headers['Authorization'] = authorization;
     }
 
     const req = http.request(
-      { hostname: host, port, path, method: 'POST', headers, timeout: 10000 },
+      { hostname: host, port, path, method: 'POST', headers, timeout: PTZ_TIMEOUT_MS, agent: ptzAgent },
       (res) => {
+        // Callers that only need the status drain successful replies unread;
+        // error bodies are still collected for the error message.
+        if (!readBody && res.statusCode === 200) {
+          res.resume();
+          res.on('end', () => resolve({ statusCode: 200, headers: res.headers, body: '' }));
+          return;
+        }
         const chunks: Buffer[] = [];
         res.on('data', (chunk) => chunks.push(chunk));
         res.on('end', () => {
@@ -132,31 +149,89 @@ function httpPost(
   });
 }
 
+const PTZ_SERVICE_PATH = '/onvif/ptz_service';
+
+// Static envelope parts, joined once; only the security header and body vary.
+const ENVELOPE_HEAD = [
+  '<?xml version="1.0" encoding="UTF-8"?>',
+  '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"',
+  '  xmlns:tptz="http://www.onvif.org/ver20/ptz/wsdl"',
+  '  xmlns:tt="http://www.onvif.org/ver10/schema">',
+  '  <s:Header>',
+  '',
+].join('\n');
+const ENVELOPE_MIDDLE = ['', '  </s:Header>', '  <s:Body>', ''].join('\n');
+const ENVELOPE_TAIL = ['', '  </s:Body>', '</s:Envelope>'].join('\n');
+
+// Per-camera backoff: after repeated consecutive failures, reject commands
+// immediately for base * 2^n ms (capped) instead of waiting out a timeout
+// every time. Stop is always attempted, so a camera that recovers during the
+// backoff is never left driving a move started before the failures.
+const BACKOFF_THRESHOLD = 2;
+const BACKOFF_BASE_MS = 500;
+const BACKOFF_MAX_MS = 30_000;
+
+interface BackoffState {
+  failures: number;
+  skipUntil: number;
+}
+
+const backoffs = new Map<string, BackoffState>();
+
+function recordFailure(key: string): void {
+  const state = backoffs.get(key) ?? { failures: 0, skipUntil: 0 };
+  state.failures++;
+  if (state.failures >= BACKOFF_THRESHOLD) {
+    state.skipUntil =
+      performance.now() + Math.min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * 2 ** state.failures);
+  }
+  backoffs.set(key, state);
+}
+
 async function ptzSoapRequest(
   host: string,
   port: number,
   soapBody: string,
   username: string,
-  password: string
+  password: string,
+  readBody = true,
+  ignoreBackoff = false
 ): Promise<string> {
-  const path = '/onvif/ptz_service';
-  const wsSecHeader = buildWsSecurityHeader(username, password);
-
-  const envelope = [
-    '<?xml version="1.0" encoding="UTF-8"?>',
-    '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"',
-    '  xmlns:tptz="http://www.onvif.org/ver20/ptz/wsdl"',
-    '  xmlns:tt="http://www.onvif.org/ver10/schema">',
-    '  <s:Header>',
-    wsSecHeader,
-    '  </s:Header>',
-    '  <s:Body>',
-    soapBody,
-    '  </s:Body>',
-    '</s:Envelope>',
-  ].join('\n');
+  const key = cameraKey(host, port);
+  const backoff = backoffs.get(key);
+  if (!ignoreBackoff && backoff && performance.now() < backoff.skipUntil) {
+    throw new Error(`PTZ camera ${key} unavailable, retry after backoff`);
+  }
+
+  try {
+    const body = await sendPtzSoap(host, port, soapBody, username, password, readBody);
+    backoffs.delete(key);
+    return body;
+  } catch (err) {
+    recordFailure(key);
+    throw err;
+  }
+}
 
-  let response = await httpPost(host, port, path, envelope);
+async function sendPtzSoap(
+  host: string,
+  port: number,
+  soapBody: string,
+  username: string,
+  password: string,
+  readBody: boolean
+): Promise<string> {
+  const path = PTZ_SERVICE_PATH;
+  // Encoded once; reused as-is if the Digest retry below resends it
+  const envelope = Buffer.from(
+    ENVELOPE_HEAD +
+      buildWsSecurityHeader(username, password) +
+      ENVELOPE_MIDDLE +
+      soapBody +
+      ENVELOPE_TAIL
+  );
+
+  let response = await httpPost(host, port, path, envelope, undefined, readBody);
 
   // Retry with HTTP Digest if WS-Security is not accepted
   if (response.statusCode === 401) {
@@ -165,7 +240,7 @@ async function ptzSoapRequest(
       const challenge = parseDigestChallenge(wwwAuth);
       if (challenge) {
         const authHeader = buildDigestAuthHeader('POST', path, username, password, challenge, 1);
-        response = await httpPost(host, port, path, envelope, authHeader);
+        response = await httpPost(host, port, path, envelope, authHeader, readBody);
       }
     }
   }
@@ -204,13 +279,46 @@ function extractAttribute(xml: string, attr: string): string {
 // Resolve the first PTZ-capable profile token
 // ---------------------------------------------------------------------------
 
-async function resolvePtzProfileToken(
+/** Profile tokens rarely change; re-resolve after this long. */
+const PROFILE_TOKEN_TTL_MS = 5 * 60_000;
+
+const profileTokens = new Map<string, { token: Promise<string>; expiresAt: number }>();
+
+/**
+ * Cached per camera so a move/stop does not pay an extra GetProfiles round
+ * trip. The pending promise is cached too, so concurrent callers share it.
+ */
+function resolvePtzProfileToken(
+  host: string,
+  port: number,
+  username: string,
+  password: string
+): Promise<string> {
+  const key = `${cameraKey(host, port)}:${username}`;
+  const now = performance.now();
+  const cached = profileTokens.get(key);
+  if (cached && now < cached.expiresAt) return cached.token;
+
+  const token = fetchPtzProfileToken(host, port, username, password);
+  profileTokens.set(key, { token, expiresAt: now + PROFILE_TOKEN_TTL_MS });
+  token.catch(() => {
+    if (profileTokens.get(key)?.token === token) profileTokens.delete(key);
+  });
+  return token;
+}
+
+async function fetchPtzProfileToken(
   host: string,
   port: number,
   username: string,
   password: string
 ): Promise<string> {
-  const profiles = await getProfiles(host, port, username, password);
+  // Queued like every other request to this camera, so it cannot overtake
+  // (or be overtaken by) a move or stop already in flight
+  let profiles: OnvifMediaProfile[] = [];
+  await enqueueCommand(cameraKey(host, port), async () => {
+    profiles = await getProfiles(host, port, username, password);
+  });
   // Prefer a profile that has a PTZ configuration
   const ptzProfile = profiles.find((p) => p.ptzToken) || profiles[0];
   if (!ptzProfile) {
@@ -229,25 +337,21 @@ interface PtzVelocity {
   zoomZ: number;
 }
 
+/** Unit pan/tilt/zoom vector per direction, scaled by speed. */
+const DIRECTION_VECTORS: Record<PtzDirection, readonly [number, number, number]> = {
+  up: [0, 1, 0],
+  down: [0, -1, 0],
+  left: [-1, 0, 0],
+  right: [1, 0, 0],
+  zoomIn: [0, 0, 1],
+  zoomOut: [0, 0, -1],
+  stop: [0, 0, 0],
+};
+
 function directionToVelocity(direction: PtzDirection, speed: number): PtzVelocity {
   const s = Math.min(Math.max(speed, 0), 1); // clamp 0..1
-  switch (direction) {
-    case 'up':
-      return { panX: 0, tiltY: s, zoomZ: 0 };
-    case 'down':
-      return { panX: 0, tiltY: -s, zoomZ: 0 };
-    case 'left':
-      return { panX: -s, tiltY: 0, zoomZ: 0 };
-    case 'right':
-      return { panX: s, tiltY: 0, zoomZ: 0 };
-    case 'zoomIn':
-      return { panX: 0, tiltY: 0, zoomZ: s };
-    case 'zoomOut':
-      return { panX: 0, tiltY: 0, zoomZ: -s };
-    case 'stop':
-    default:
-      return { panX: 0, tiltY: 0, zoomZ: 0 };
-  }
+  const [x, y, z] = DIRECTION_VECTORS[direction] ?? DIRECTION_VECTORS.stop;
+  return { panX: x * s, tiltY: y * s, zoomZ: z * s };
 }
 
 // ---------------------------------------------------------------------------
@@ -257,9 +361,124 @@ function directionToVelocity(direction: PtzDirection, speed: number): PtzVelocit
 /** Default duration (ms) for a ContinuousMove before auto-stop. */
 const DEFAULT_MOVE_DURATION_MS = 500;
 
+// ---------------------------------------------------------------------------
+// Auto-stop deadlines
+// ---------------------------------------------------------------------------
+
+interface AutoStopState {
+  /** Velocity currently being driven, as "panX,tiltY,zoomZ". */
+  velocity: string;
+  deadline: number;
+  timer: ReturnType<typeof setTimeout>;
+  stop: () => Promise<void>;
+}
+
+/**
+ * One pending auto-stop per camera. A new move only pushes the deadline
+ * forward, so the timer of an earlier move can never cut a later one short.
+ */
+const autoStops = new Map<string, AutoStopState>();
+
+function cameraKey(host: string, port: number): string {
+  return `${host}:${port}`;
+}
+
+function scheduleAutoStop(
+  key: string,
+  velocity: string,
+  durationMs: number,
+  stop: () => Promise<void>
+): void {
+  const deadline = performance.now() + durationMs;
+  const existing = autoStops.get(key);
+  if (existing) {
+    existing.velocity = velocity;
+    existing.deadline = deadline;
+    existing.stop = stop;
+    return;
+  }
+
+  const check = () => {
+    const state = autoStops.get(key);
+    if (!state) return;
+    const remaining = state.deadline - performance.now();
+    if (remaining > 0) {
+      state.timer = setTimeout(check, remaining);
+      return;
+    }
+    autoStops.delete(key);
+    state.stop().catch((err) => {
+      console.error('[PTZ] Auto-stop error:', err.message);
+    });
+  };
+
+  autoStops.set(key, { velocity, deadline, timer: setTimeout(check, durationMs), stop });
+}
+
+function cancelAutoStop(key: string): void {
+  const state = autoStops.get(key);
+  if (state) {
+    clearTimeout(state.timer);
+    autoStops.delete(key);
+  }
+}
+
+// ---------------------------------------------------------------------------
+// Per-camera command queue
+// ---------------------------------------------------------------------------
+
+interface CommandQueue {
+  tail: Promise<unknown>;
+  /** Sequence number of the most recently queued motion command. */
+  latestMotion: number;
+}
+
+const commandQueues = new Map<string, CommandQueue>();
+let motionSeq = 0;
+
+/**
+ * Send PTZ commands for one camera strictly in order — with a keep-alive
+ * pool a Stop and the next ContinuousMove could otherwise travel on
+ * different sockets and arrive reversed. Motion commands (move/stop/preset) that
+ * are superseded by a newer one before they start are dropped, since only
+ * the latest velocity matters.
+ *
+ * @returns true if the command was sent, false if it was superseded.
+ */
+function enqueueCommand(
+  key: string,
+  task: () => Promise<unknown>,
+  motion = false
+): Promise<boolean> {
+  let queue = commandQueues.get(key);
+  if (!queue) {
+    queue = { tail: Promise.resolve(), latestMotion: 0 };
+    commandQueues.set(key, queue);
+  }
+  const q = queue;
+  const seq = motion ? (q.latestMotion = ++motionSeq) : 0;
+
+  const run = q.tail.then(async () => {
+    if (motion && seq !== q.latestMotion) return false;
+    await task();
+    return true;
+  });
+
+  const tail = run.catch(() => undefined);
+  q.tail = tail;
+  tail.then(() => {
+    if (q.tail === tail) commandQueues.delete(key);
+  });
+
+  return run;
+}
+
 /**
  * Move the camera in a given direction at the specified speed.
- * Uses ONVIF ContinuousMove → waits → Stop for smooth control.
+ * Uses ONVIF ContinuousMove, then Stop once the per-camera deadline expires.
+ * Repeated moves extend the deadline instead of racing separate timers, and a
+ * move at the velocity already in effect sends nothing. Changing direction
+ * sends a single ContinuousMove, which replaces the velocity without a Stop.
  * For 'stop' direction, sends Stop immediately.
  *
  * @param speed 0.0 – 1.0 (default 0.5)
@@ -275,53 +494,72 @@ export async function move(
   durationMs = DEFAULT_MOVE_DURATION_MS
 ): Promise<void> {
   const profileToken = await resolvePtzProfileToken(host, port, username, password);
+  const key = cameraKey(host, port);
 
   if (direction === 'stop') {
-    await stopMove(host, port, username, password, profileToken);
+    cancelAutoStop(key);
+    await drive(host, port, username, password, profileToken, null);
     return;
   }
 
   const vel = directionToVelocity(direction, speed);
+  const velocity = `${vel.panX},${vel.tiltY},${vel.zoomZ}`;
+  const stop = async () => {
+    await drive(host, port, username, password, profileToken, null);
+  };
 
-  const soapBody = [
-    '<tptz:ContinuousMove>',
-    `  <tptz:ProfileToken>${profileToken}</tptz:ProfileToken>`,
-    '  <tptz:Velocity>',
-    `    <tt:PanTilt x="${vel.panX}" y="${vel.tiltY}"/>`,
-    `    <tt:Zoom x="${vel.zoomZ}"/>`,
-    '  </tptz:Velocity>',
-    '</tptz:ContinuousMove>',
-  ].join('\n');
+  // Camera is already driving at this velocity — just extend the deadline
+  // instead of re-sending an identical ContinuousMove.
+  if (autoStops.get(key)?.velocity === velocity) {
+    scheduleAutoStop(key, velocity, durationMs, stop);
+    return;
+  }
 
-  await ptzSoapRequest(host, port, soapBody, username, password);
+  const sent = await drive(host, port, username, password, profileToken, vel);
 
-  // Auto-stop after duration for smooth control
-  setTimeout(() => {
-    stopMove(host, port, username, password, profileToken).catch((err) => {
-      console.error('[PTZ] Auto-stop error:', err.message);
-    });
-  }, durationMs);
+  // Auto-stop once the deadline passes without a newer move
+  if (sent) scheduleAutoStop(key, velocity, durationMs, stop);
 }
 
 /**
- * Stop all PTZ movement on the camera.
+ * Single motion entry point: ContinuousMove at `vel`, or Stop when `vel` is
+ * null. Both go through the camera's motion queue, so a burst of drive
+ * changes collapses to the latest one.
+ *
+ * @returns true if the command was sent, false if a newer one superseded it.
  */
-async function stopMove(
+function drive(
   host: string,
   port: number,
   username: string,
   password: string,
-  profileToken: string
-): Promise<void> {
-  const soapBody = [
-    '<tptz:Stop>',
-    `  <tptz:ProfileToken>${profileToken}</tptz:ProfileToken>`,
-    '  <tptz:PanTilt>true</tptz:PanTilt>',
-    '  <tptz:Zoom>true</tptz:Zoom>',
-    '</tptz:Stop>',
-  ].join('\n');
-
-  await ptzSoapRequest(host, port, soapBody, username, password);
+  profileToken: string,
+  vel: PtzVelocity | null
+): Promise<boolean> {
+  const soapBody = vel
+    ? [
+        '<tptz:ContinuousMove>',
+        `  <tptz:ProfileToken>${profileToken}</tptz:ProfileToken>`,
+        '  <tptz:Velocity>',
+        `    <tt:PanTilt x="${vel.panX}" y="${vel.tiltY}"/>`,
+        `    <tt:Zoom x="${vel.zoomZ}"/>`,
+        '  </tptz:Velocity>',
+        '</tptz:ContinuousMove>',
+      ].join('\n')
+    : [
+        '<tptz:Stop>',
+        `  <tptz:ProfileToken>${profileToken}</tptz:ProfileToken>`,
+        '  <tptz:PanTilt>true</tptz:PanTilt>',
+        '  <tptz:Zoom>true</tptz:Zoom>',
+        '</tptz:Stop>',
+      ].join('\n');
+
+  return enqueueCommand(
+    cameraKey(host, port),
+    // Stop bypasses the failure backoff (see BACKOFF_THRESHOLD)
+    () => ptzSoapRequest(host, port, soapBody, username, password, false, vel === null),
+    true
+  );
 }
 
 /**
@@ -341,7 +579,10 @@ export async function getPresets(
     '</tptz:GetPresets>',
   ].join('\n');
 
-  const xml = await ptzSoapRequest(host, port, soapBody, username, password);
+  let xml = '';
+  await enqueueCommand(cameraKey(host, port), async () => {
+    xml = await ptzSoapRequest(host, port, soapBody, username, password);
+  });
 
   const presetBlocks = extractAllBlocks(xml, 'Preset');
   return presetBlocks.map((block) => ({
@@ -352,6 +593,9 @@ export async function getPresets(
 
 /**
  * Move the camera to a previously saved preset position.
+ * Queued as a motion command: it supersedes moves/stops that have not been
+ * sent yet, and a pending auto-stop is cancelled so it cannot halt the preset
+ * travel midway.
  */
 export async function gotoPreset(
   host: string,
@@ -373,5 +617,11 @@ export async function gotoPreset(
     '</tptz:GotoPreset>',
   ].join('\n');
 
-  await ptzSoapRequest(host, port, soapBody, username, password);
+  const key = cameraKey(host, port);
+  cancelAutoStop(key);
+  await enqueueCommand(
+    key,
+    () => ptzSoapRequest(host, port, soapBody, username, password, false),
+    true
+  );
 }
@@ -116,7 +116,7 @@ class YoloDetector {
       return response;
     } catch {
       this.available = false;
-      this.lastCheckAt = Date.now();
+      this.lastCheckAt = performance.now();
       return null;
     }
   }
@@ -160,7 +160,7 @@ class YoloDetector {
         console.warn('[YOLO] Detection error:', (error as Error).message);
       }
       this.available = false;
-      this.lastCheckAt = Date.now();
+      this.lastCheckAt = performance.now();
       return [];
     }
   }
@@ -209,7 +209,7 @@ class YoloDetector {
   }
 
   private async isAvailable(): Promise<boolean> {
-    const now = Date.now();
+    const now = performance.now();
     if (this.available !== null && now - this.lastCheckAt < this.checkIntervalMs) {
       return this.available;
     }